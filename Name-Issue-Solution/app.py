@@ -1,36 +1,72 @@
 import streamlit as st
 import pandas as pd
-import difflib
+import hashlib
+import io
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from syntax_bridge import SyntaxBridgeEngine
+from resolution_cache import TieredCache
+from heal_csv import read_pairs
 
 st.set_page_config(page_title="Team Eklavya - Data Audit", layout="wide")
 
-# THE ENGINE
-class SyntaxBridgeEngine:
-    def __init__(self, master_list):
-        self.valid_districts = set(master_list) 
-        self.master_list = master_list          
-        self.cache = {}
-
-    def resolve(self, dirty_name):
-        if dirty_name in self.valid_districts:
-            return dirty_name, 1.0, "Valid"
-        
-        if dirty_name in self.cache:
-            return self.cache[dirty_name]
-
-        matches = difflib.get_close_matches(dirty_name, self.master_list, n=1, cutoff=0.8)
-        if matches:
-            score = difflib.SequenceMatcher(None, dirty_name, matches[0]).ratio()
-            self.cache[dirty_name] = (matches[0], score, "Healed")
-            return matches[0], score, "Healed"
-        
-        return None, 0.0, "Ghost"
+LARGE_UPLOAD_BYTES = 50 * 1024 * 1024  # Bigger uploads are indexed in the background
+POLL_SECONDS = 1.0
+
+# CACHED LOADING (survives reruns; keyed on file content, not on the widget)
+def source_key(path=None, upload=None):
+    """Cheap content key: size + mtime for local files, a one-off SHA-256 for uploads."""
+    if path:
+        stat = os.stat(path)
+        return f"file:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    digests = st.session_state.setdefault('upload_digests', {})
+    upload_id = getattr(upload, 'file_id', None) or (upload.name, upload.size)
+    if upload_id not in digests:
+        digests[upload_id] = hashlib.sha256(upload.getvalue()).hexdigest()
+    return f"upload:{digests[upload_id]}"
+
+@st.cache_data(show_spinner="Indexing district vocabulary...")
+def load_pairs(key, _path=None, _upload=None):
+    # Uploads are copied into a buffer only on a cache miss, not on every rerun
+    return read_pairs([_path or io.BytesIO(_upload.getvalue())])
+
+@st.cache_resource(show_spinner=False)
+def background_pool():
+    return ThreadPoolExecutor(max_workers=2)
+
+@st.cache_resource(show_spinner="Building resolution engine...")
+def build_engine(key, _pairs):
+    # Districts are resolved within their own state; resolutions persist across reruns
+    return SyntaxBridgeEngine(_pairs['district'].tolist(), _pairs['state'].tolist(), cache=TieredCache())
+
+def vocabulary(path=None, upload=None):
+    """(key, distinct state/district pairs); pairs are None while a large upload is still indexing."""
+    key = source_key(path, upload)
+    if upload is None or upload.size < LARGE_UPLOAD_BYTES:
+        return key, load_pairs(key, path, upload)
+    jobs = st.session_state.setdefault('vocabulary_jobs', {})
+    if key not in jobs:
+        jobs[key] = background_pool().submit(read_pairs, [io.BytesIO(upload.getvalue())])
+    if not jobs[key].done():
+        return key, None
+    try:
+        return key, jobs[key].result()
+    except Exception as e:
+        # Dropping the failed job lets the next rerun index the upload again
+        del jobs[key]
+        st.error(f"Indexing Error: {e}")
+        return key, None
+
+def still_indexing(key):
+    """True while a background vocabulary job for the key has not finished."""
+    return key in st.session_state.get('vocabulary_jobs', {})
 
 # THE UI 
 st.title("🛡️ Eklavya: Live Data Reconciliation System")
 
 col1, col2 = st.columns([1, 2])
+indexing = False
 
 # SIDEBAR: CONFIGURATION
 with st.sidebar:
@@ -39,17 +75,23 @@ with st.sidebar:
     # Auto-load local file if present for speed
     master_file = "api_data_aadhar_biometric_500000_1000000.csv"
     valid_districts = []
+    master_key, master_pairs = None, None
     
     if os.path.exists(master_file):
-        df_bio = pd.read_csv(master_file)
-        valid_districts = sorted(df_bio['district'].unique().tolist())
+        master_key, master_pairs = vocabulary(path=master_file)
+        valid_districts = sorted(master_pairs['district'].unique().tolist())
         st.success(f"✅ Loaded Local DB: {len(valid_districts)} Districts")
     else:
         uploaded_bio = st.file_uploader("Upload Biometric CSV", type=['csv'], key="bio")
         if uploaded_bio:
-            df_bio = pd.read_csv(uploaded_bio)
-            valid_districts = sorted(df_bio['district'].unique().tolist())
-            st.success(f"✅ DB Active: {len(valid_districts)} Records")
+            master_key, master_pairs = vocabulary(upload=uploaded_bio)
+            if master_pairs is None:
+                if still_indexing(master_key):
+                    indexing = True
+                    st.info("⏳ Indexing large upload in the background...")
+            else:
+                valid_districts = sorted(master_pairs['district'].unique().tolist())
+                st.success(f"✅ DB Active: {len(valid_districts)} Records")
 
     st.markdown("---")
     st.header("2. Ingest Audit Data")
@@ -57,24 +99,33 @@ with st.sidebar:
     # Try to find enrollment file automatically too
     enrol_file = "api_data_aadhar_enrolment_0_500000.csv"
     audit_districts = []
+    audit_pairs = None
     
     if os.path.exists(enrol_file):
-        df_enrol = pd.read_csv(enrol_file)
-        audit_districts = sorted(df_enrol['district'].unique().tolist())
+        _, audit_pairs = vocabulary(path=enrol_file)
+        audit_districts = sorted(audit_pairs['district'].unique().tolist())
         st.success(f"⚠️ Ingested Audit Batch: {len(audit_districts)} Districts")
     else:
         uploaded_enrol = st.file_uploader("Upload Enrollment CSV", type=['csv'], key="enrol")
         if uploaded_enrol:
-            df_enrol = pd.read_csv(uploaded_enrol)
-            audit_districts = sorted(df_enrol['district'].unique().tolist())
-            st.success(f"⚠️ Audit Batch Ready: {len(audit_districts)} Districts")
+            audit_key, audit_pairs = vocabulary(upload=uploaded_enrol)
+            if audit_pairs is None:
+                if still_indexing(audit_key):
+                    indexing = True
+                    st.info("⏳ Indexing large upload in the background...")
+            else:
+                audit_districts = sorted(audit_pairs['district'].unique().tolist())
+                st.success(f"⚠️ Audit Batch Ready: {len(audit_districts)} Districts")
 
 # MAIN PANEL
 if not valid_districts:
     st.error("Waiting for Master Database...")
+    if indexing:
+        time.sleep(POLL_SECONDS)
+        st.rerun()
     st.stop()
 
-engine = SyntaxBridgeEngine(valid_districts)
+engine = build_engine(master_key, master_pairs)
 
 # TABBED INTERFACE
 tab1, tab2 = st.tabs(["🔴 Live Anomaly Scanner", "🛠️ Manual Inspector"])
@@ -85,27 +136,25 @@ with tab1:
     
     if audit_districts:
         if st.button("RUN FULL AUDIT NOW", type="primary"):
-            progress = st.progress(0)
             ghosts_found = []
             
             # THE REAL SCAN LOGIC
-            # We filter for districts in Enrollment that are NOT in Biometric
-            suspects = [d for d in audit_districts if d not in valid_districts]
+            # We filter for districts in Enrollment that are NOT in Biometric (for the same state)
+            suspects = [(s, d) for s, d in audit_pairs.itertuples(index=False) if not engine.is_valid(d, s)]
             
             status_text = st.empty()
             status_text.text(f"Identified {len(suspects)} Suspects. Attempting Resolution...")
             
-            for i, suspect in enumerate(suspects):
-                fixed, score, status = engine.resolve(suspect)
+            # One batched call resolves every suspect
+            resolved = engine.resolve_many([d for _, d in suspects], [s for s, _ in suspects])
+            for (state, suspect), (fixed, score, status) in zip(suspects, resolved):
                 if status == "Healed":
                     ghosts_found.append({
+                        "STATE": state,
                         "ORIGINAL (Enrollment)": suspect,
                         "RESOLVED TO (Biometric)": fixed,
                         "CONFIDENCE": f"{int(score*100)}%"
                     })
-                progress.progress((i + 1) / len(suspects))
-            
-            progress.empty()
             
             if ghosts_found:
                 st.error(f"🚨 CRITICAL: Found {len(ghosts_found)} Naming Anomalies!")
@@ -123,11 +172,17 @@ with tab1:
 with tab2:
     st.subheader("Single Record Test")
     user_input = st.text_input("Test a Name manually:", "Visakhapatanam")
+    user_state = st.text_input("State (optional, narrows the search):", "")
     if user_input:
-        fixed, score, status = engine.resolve(user_input)
+        fixed, score, status = engine.resolve(user_input, user_state or None)
         if status == "Valid":
             st.success("Valid Name")
         elif status == "Healed":
             st.warning(f"Healed: {fixed} ({int(score*100)}%)")
         else:
-            st.error("Unknown Entity")
\ No newline at end of file
+            st.error("Unknown Entity")
+
+# Keep polling while an upload is still being indexed in the background
+if indexing:
+    time.sleep(POLL_SECONDS)
+    st.rerun()
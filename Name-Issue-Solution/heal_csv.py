@@ -0,0 +1,154 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'analysis')))
+import data_loader
+from resolution_cache import CACHE_FILE, LRUCache, SQLiteCache, TieredCache
+from syntax_bridge import PHONETIC_SCORE, SyntaxBridgeEngine, normalize_state
+
+DEFAULT_MASTER = os.path.join(data_loader.BASE_DIR, "api_data_aadhar_biometric")
+DEFAULT_OUTPUT = os.path.join(data_loader.BASE_DIR, "healed")
+REPORT_FILE = "district_mapping_report.csv"
+# Heals below this confidence go to the report only; the default admits key, alias and phonetic heals
+MIN_HEAL_SCORE = PHONETIC_SCORE
+
+def expand_inputs(paths):
+    """Resolves files and dataset folders to a sorted list of CSV shards."""
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.csv"))) if os.path.isdir(path) else [path])
+    return files
+
+def read_pairs(sources, chunksize=data_loader.CHUNK_SIZE):
+    """Distinct (state, district) pairs of CSV files or buffers, reading only those two columns."""
+    pairs = []
+    for source in sources:
+        for chunk in pd.read_csv(source, usecols=['state', 'district'], dtype='category', chunksize=chunksize):
+            pairs.append(chunk.drop_duplicates())
+    if not pairs:
+        return pd.DataFrame({'state': [], 'district': []}, dtype=str)
+    return pd.concat(pairs).astype(str).drop_duplicates().reset_index(drop=True)
+
+def load_master(paths, chunksize=data_loader.CHUNK_SIZE):
+    """Streams the master shards once, keeping only their distinct (state, district) pairs."""
+    files = expand_inputs(paths)
+    if not files:
+        raise FileNotFoundError(f"No master shards found in {', '.join(paths)}")
+    master = read_pairs(files, chunksize)
+    return master['district'].tolist(), master['state'].tolist()
+
+def heal_chunk(chunk, engine, use_states=True, normalize_states=True, min_score=MIN_HEAL_SCORE):
+    """
+    Heals the district (and state) columns of one raw chunk.
+
+    Every distinct (state, district) pair is resolved once; the healed labels
+    are then broadcast to all rows through the pair codes. Heals scoring
+    below min_score keep their original label and are only reported.
+    Returns the healed chunk and a per-pair mapping with row counts.
+    """
+    states, districts = chunk['state'].astype(str), chunk['district'].astype(str)
+    codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([states, districts]))
+    pair_states = pairs.get_level_values(0)
+    pair_districts = pairs.get_level_values(1)
+
+    resolved = engine.resolve_many(list(pair_districts), list(pair_states) if use_states else None)
+    applied = [status == "Valid" or (status == "Healed" and score >= min_score)
+               for _, score, status in resolved]
+    healed = np.array([match if keep else name
+                       for name, (match, _, _), keep in zip(pair_districts, resolved, applied)], dtype=object)
+
+    chunk = chunk.copy()
+    chunk['district'] = healed[codes]
+    if normalize_states:
+        canonical = np.array([normalize_state(s) or s for s in pair_states], dtype=object)
+        chunk['state'] = canonical[codes]
+
+    mapping = pd.DataFrame({
+        'state': pair_states, 'district': pair_districts,
+        'resolved_district': [r[0] for r in resolved],
+        'score': [r[1] for r in resolved],
+        'status': [r[2] for r in resolved],
+        'applied': applied,
+        'rows': np.bincount(codes, minlength=len(pairs)),
+    })
+    return chunk, mapping
+
+def heal_shard(path, output_path, engine, chunksize=data_loader.CHUNK_SIZE, **options):
+    """Streams one shard through the engine into a healed copy; returns its mapping."""
+    tmp_path = f"{output_path}.tmp-{os.getpid()}"
+    mappings = []
+    try:
+        # Every column stays text so untouched values are written back byte for byte
+        reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+        for i, chunk in enumerate(reader):
+            healed, mapping = heal_chunk(chunk, engine, **options)
+            healed.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            mappings.append(mapping)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return pd.concat(mappings) if mappings else pd.DataFrame()
+
+def build_report(mappings):
+    """Collapses per-chunk mappings into one row per original (state, district) pair."""
+    report = pd.concat(mappings, ignore_index=True)
+    keys = ['state', 'district', 'resolved_district', 'score', 'status', 'applied']
+    report = report.groupby(keys, dropna=False, sort=False)['rows'].sum().reset_index()
+    # Healed pairs first, then ghosts, each by affected rows
+    report['order'] = report['status'].map({'Healed': 0, 'Ghost': 1, 'Valid': 2})
+    report = report.sort_values(['order', 'rows'], ascending=[True, False], ignore_index=True)
+    return report.drop(columns='order')
+
+def main():
+    parser = argparse.ArgumentParser(description="Heal district names in raw UIDAI CSV shards.")
+    parser.add_argument('inputs', nargs='+', help="CSV shards or dataset folders to heal")
+    parser.add_argument('--master', nargs='+', default=[DEFAULT_MASTER],
+                        help="Master (truth) shards or folders (default: biometric dataset)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Directory for healed shards and the report")
+    parser.add_argument('--chunksize', type=int, default=data_loader.CHUNK_SIZE)
+    parser.add_argument('--no-state-blocking', action='store_true', help="Match districts nationally")
+    parser.add_argument('--keep-states', action='store_true', help="Write state labels unchanged")
+    parser.add_argument('--min-score', type=float, default=MIN_HEAL_SCORE,
+                        help=f"Lowest confidence written into healed shards (default: {MIN_HEAL_SCORE}, "
+                             "key/alias and phonetic heals); weaker heals are reported only")
+    parser.add_argument('--cache', default=CACHE_FILE, help="SQLite resolution cache ('' for memory only)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        master_districts, master_states = load_master(args.master, args.chunksize)
+        cache = TieredCache(LRUCache(), SQLiteCache(args.cache)) if args.cache else LRUCache()
+        engine = SyntaxBridgeEngine(master_districts, master_states, cache=cache)
+        print(f"Master DB: {len(set(master_districts))} districts across {len(engine.blocks)} states")
+
+        os.makedirs(args.output, exist_ok=True)
+        mappings = []
+        for path in expand_inputs(args.inputs):
+            print(f"Healing {os.path.basename(path)}...")
+            mappings.append(heal_shard(path, os.path.join(args.output, os.path.basename(path)), engine,
+                                       args.chunksize, use_states=not args.no_state_blocking,
+                                       normalize_states=not args.keep_states, min_score=args.min_score))
+        if not mappings:
+            print("I/O Warning: No input shards found.")
+            return
+
+        report = build_report(mappings)
+        report.to_csv(os.path.join(args.output, REPORT_FILE), index=False)
+        rows = report.groupby('status')['rows'].sum()
+        held_back = report.loc[(report['status'] == "Healed") & ~report['applied'], 'rows'].sum()
+        print(f"Rows -> Valid: {rows.get('Valid', 0):,} | Healed: {rows.get('Healed', 0):,} "
+              f"({held_back:,} below --min-score left unchanged) | Ghost: {rows.get('Ghost', 0):,}")
+        print(f"Healed shards and mapping report written to {args.output} "
+              f"({time.perf_counter() - start:.1f}s)")
+    except Exception as e:
+        print(f"Healing Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
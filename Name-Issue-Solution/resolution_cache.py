@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LRU_SIZE = 50_000  # Entries kept in memory per engine
+DISK_SIZE = 2_000_000  # Rows kept on disk across all masters; least recently used go first
+SCHEMA_VERSION = 3  # Bump whenever the table layout changes; older files are dropped
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".resolution_cache.sqlite")
+
+def master_fingerprint(master_list, master_states=None, **params):
+    """Hash of everything a resolution depends on: master names, their states and the matching parameters."""
+    states = master_states if master_states is not None else [None] * len(master_list)
+    pairs = sorted({(str(s), str(d)) for s, d in zip(states, master_list)})
+    payload = json.dumps({'pairs': pairs, 'params': params}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class LRUCache:
+    """
+    Bounded in-memory resolution cache; least recently used entries are evicted.
+
+    Keys are (method, block, name) tuples and values (match, score, status) tuples,
+    including "Ghost" misses so unresolvable names are not re-scanned.
+    """
+
+    def __init__(self, maxsize=LRU_SIZE):
+        self.maxsize = maxsize
+        self.fingerprint = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bind(self, fingerprint):
+        """Attaches the cache to a master list; entries for another master are dropped."""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self._entries.clear()
+                self.fingerprint = fingerprint
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCache:
+    """
+    On-disk resolution cache shared across runs and processes.
+
+    Rows are namespaced by the master fingerprint, so processes resolving
+    against different masters share one file without ever reading each
+    other's heals. Every row carries its last-used time; once the file
+    holds more than max_rows, the least recently used rows are evicted.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_rows=DISK_SIZE):
+        self.path = path
+        self.max_rows = max_rows
+        self.fingerprint = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS resolutions")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS resolutions (
+            fingerprint TEXT, method TEXT, block TEXT, name TEXT, match TEXT, score REAL, status TEXT,
+            used REAL, PRIMARY KEY (fingerprint, method, block, name))""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS resolutions_by_name ON resolutions (fingerprint, name)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS resolutions_by_use ON resolutions (used)")
+        self._conn.commit()
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM resolutions").fetchone()[0]
+
+    def bind(self, fingerprint):
+        with self._lock:
+            self.fingerprint = fingerprint
+
+    def get_many(self, keys):
+        found = {}
+        wanted = set(keys)
+        names = list({name for _, _, name in wanted})
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(names), 500):
+                batch = names[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT method, block, name, match, score, status FROM resolutions "
+                    f"WHERE fingerprint = ? AND name IN ({','.join('?' * len(batch))})",
+                    [self.fingerprint] + batch)
+                for method, block, name, match, score, status in rows:
+                    key = (method, block or None, name)
+                    if key in wanted:
+                        found[key] = (match, score, status)
+            if found:
+                self._conn.executemany(
+                    "UPDATE resolutions SET used = ? WHERE fingerprint = ? AND method = ? AND block = ? AND name = ?",
+                    [(time.time(), self.fingerprint, method, block or '', name) for method, block, name in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO resolutions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(self.fingerprint, method, block or '', name, match, score, status, now)
+                 for (method, block, name), (match, score, status) in items.items()])
+            # Replacements are counted too, so this only over-estimates and triggers a recount
+            self._rows += len(items)
+            if self._rows > self.max_rows:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Trims the file to 90% of max_rows, least recently used rows first (caller holds the lock)."""
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM resolutions").fetchone()[0]
+        excess = self._rows - int(self.max_rows * 0.9)
+        if self._rows > self.max_rows and excess > 0:
+            self._conn.execute("DELETE FROM resolutions WHERE rowid IN "
+                               "(SELECT rowid FROM resolutions ORDER BY used LIMIT ?)", (excess,))
+            self._rows -= excess
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM resolutions WHERE fingerprint = ?",
+                                      (self.fingerprint,)).fetchone()[0]
+
+class TieredCache:
+    """In-memory LRU in front of an on-disk cache; disk hits are promoted to memory."""
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk if disk is not None else SQLiteCache()
+
+    def bind(self, fingerprint):
+        self.memory.bind(fingerprint)
+        self.disk.bind(fingerprint)
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = self.memory.get_many(keys)
+        missing = [k for k in keys if k not in found]
+        if missing:
+            from_disk = self.disk.get_many(missing)
+            self.memory.put_many(from_disk)
+            found.update(from_disk)
+        return found
+
+    def put_many(self, items):
+        self.memory.put_many(items)
+        self.disk.put_many(items)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def __len__(self):
+        return len(self.disk)
@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from heal_csv import DEFAULT_MASTER, load_master
+from resolution_cache import CACHE_FILE, LRUCache, SQLiteCache, TieredCache
+from syntax_bridge import SyntaxBridgeEngine
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BATCH = 512  # Names per resolve_many call
+MAX_WAIT_MS = 2.0  # How long the first queued name waits for company
+QUEUE_SIZE = 10_000  # Pending names before requests are rejected with 503
+MAX_REQUEST_NAMES = 2_000  # Names accepted in one POST (kept well below QUEUE_SIZE)
+KEEP_ALIVE_SECONDS = 15.0
+LATENCY_WINDOW = 10_000  # Recent request latencies kept for percentiles
+
+class ServiceMetrics:
+    """Request/batch counters plus a rolling window of request latencies."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.rejected = 0
+        self.names = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self, queue_depth):
+        uptime = time.monotonic() - self.started
+        latencies = np.array(self.latencies) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        return {
+            'uptime_s': round(uptime, 1),
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'names_resolved': self.names,
+            'batches': self.batches,
+            'mean_batch_size': round(self.names / self.batches, 2) if self.batches else 0.0,
+            'queue_depth': queue_depth,
+            'throughput_names_per_s': round(self.names / uptime, 1) if uptime else 0.0,
+            'latency_ms': {'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3)},
+        }
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-name lookups into resolve_many calls.
+
+    Lookups wait in a bounded queue; a worker drains up to MAX_BATCH of them,
+    waiting at most MAX_WAIT_MS after the first, and resolves the batch on
+    a worker thread so the event loop keeps serving connections.
+    """
+
+    def __init__(self, engine, metrics, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, queue_size=QUEUE_SIZE):
+        self.engine = engine
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def submit(self, name, state=None):
+        """Queues one lookup; raises asyncio.QueueFull when the service is saturated."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((name, state, future))
+        return future
+
+    def submit_many(self, names, states):
+        """Queues several lookups, all or none: on QueueFull the ones already queued are cancelled."""
+        futures = []
+        try:
+            for name, state in zip(names, states):
+                futures.append(self.submit(name, state))
+        except asyncio.QueueFull:
+            for future in futures:
+                future.cancel()
+            raise
+        return futures
+
+    async def _resolve(self, batch):
+        """Resolves a batch in one call; if that fails, item by item so only the bad lookups fail."""
+        loop = asyncio.get_running_loop()
+        names, states, futures = zip(*batch)
+        try:
+            results = await loop.run_in_executor(None, self.engine.resolve_many, list(names), list(states))
+        except Exception:
+            results = []
+            for name, state, _ in batch:
+                try:
+                    results.append((await loop.run_in_executor(None, self.engine.resolve_many, [name], [state]))[0])
+                except Exception as e:
+                    results.append(e)
+        self.metrics.batches += 1
+        self.metrics.names += len(batch)
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+            # Lookups of requests that were rejected or abandoned are skipped
+            batch = [item for item in batch if not item[2].done()]
+            if batch:
+                await self._resolve(batch)
+
+def _payload(name, state, result):
+    match, score, status = result
+    return {'name': name, 'state': state, 'match': match, 'score': round(score, 4), 'status': status}
+
+class ResolveService:
+    """Minimal HTTP/1.1 JSON service (keep-alive) in front of a MicroBatcher."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(engine, self.metrics)
+
+    async def dispatch(self, method, target, body):
+        """Routes one request; returns (status code, JSON-serialisable body)."""
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'districts': len(self.engine.valid_districts)}
+        if url.path == '/metrics':
+            return 200, self.metrics.snapshot(self.batcher.queue.qsize())
+        if url.path != '/resolve':
+            return 404, {'error': f"Unknown path {url.path}"}
+
+        if method == 'GET':
+            query = parse_qs(url.query)
+            names, states = query.get('name', [])[:1], query.get('state', [None])[:1]
+        elif method == 'POST':
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict):
+                return 400, {'error': "Expected a JSON object"}
+            if 'names' in request:
+                names, states = request['names'], request.get('states')
+                if not isinstance(names, list) or not isinstance(states, (list, type(None))):
+                    return 400, {'error': "'names' and 'states' must be JSON arrays"}
+                states = states or [None] * len(names)
+            else:
+                names, states = [request.get('name')], [request.get('state')]
+        else:
+            return 405, {'error': f"Method {method} not allowed"}
+        if (not names or len(states) != len(names) or any(not isinstance(n, str) for n in names)
+                or any(s is not None and not isinstance(s, str) for s in states)):
+            return 400, {'error': "Expected a string 'name' (or 'names' with matching string/null 'states')"}
+        if len(names) > MAX_REQUEST_NAMES:
+            return 413, {'error': f"At most {MAX_REQUEST_NAMES} names per request"}
+
+        try:
+            futures = self.batcher.submit_many(names, states)
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            return 503, {'error': "Resolution queue is full, retry later"}
+        results = [_payload(n, s, r) for n, s, r in zip(names, states, await asyncio.gather(*futures))]
+        return 200, results if method == 'POST' and 'names' in request else results[0]
+
+    async def handle(self, reader, writer):
+        """Serves requests on one connection until the client closes or idles out."""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+                start = time.perf_counter()
+                try:
+                    code, payload = await self.dispatch(method, target, body)
+                except (ValueError, json.JSONDecodeError) as e:
+                    code, payload = 400, {'error': str(e)}
+                except Exception as e:
+                    code, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                self.metrics.requests += 1
+                self.metrics.latencies.append(time.perf_counter() - start)
+
+                keep_alive = (headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1')
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {code} {HTTPStatus(code).phrase}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        worker = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Resolution service listening on http://{host}:{port} "
+              f"({len(self.engine.valid_districts)} districts)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            worker.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve district-name resolution over local HTTP.")
+    parser.add_argument('--master', nargs='+', default=[DEFAULT_MASTER],
+                        help="Master (truth) shards or folders (default: biometric dataset)")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--cache', default=CACHE_FILE, help="SQLite resolution cache ('' for memory only)")
+    args = parser.parse_args()
+
+    try:
+        master_districts, master_states = load_master(args.master)
+        cache = TieredCache(LRUCache(), SQLiteCache(args.cache)) if args.cache else LRUCache()
+        engine = SyntaxBridgeEngine(master_districts, master_states, cache=cache)
+        asyncio.run(ResolveService(engine).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Resolution service stopped.")
+    except Exception as e:
+        print(f"Service Error: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+import difflib
+import functools
+import re
+from collections import Counter, defaultdict
+import numpy as np
+import scipy.sparse as sp
+from resolution_cache import LRUCache, master_fingerprint
+
+NGRAM_SIZE = 2
+MATCH_CUTOFF = 0.8  # Minimum SequenceMatcher ratio for a heal
+CANDIDATE_LIMIT = 50  # Candidates scored per lookup
+TFIDF_NGRAMS = (2, 3)  # Gram sizes of the batch TF-IDF vectors
+BATCH_TOP_K = 10  # Nearest master names verified per name in resolve_many
+STATE_CUTOFF = 0.85  # Minimum ratio for a misspelt state name
+PHONETIC_MIN_LENGTH = 4  # Shorter phonetic keys are too ambiguous to trust
+KEY_SCORE = 1.0  # Confidence of a heal through an exact spelling key or alias
+PHONETIC_SCORE = 0.9  # Confidence of a heal through a verified phonetic key
+
+# Current states and union territories (LGD names)
+CANONICAL_STATES = [
+    'Andaman and Nicobar Islands', 'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar',
+    'Chandigarh', 'Chhattisgarh', 'Dadra and Nagar Haveli and Daman and Diu', 'Delhi', 'Goa',
+    'Gujarat', 'Haryana', 'Himachal Pradesh', 'Jammu and Kashmir', 'Jharkhand', 'Karnataka',
+    'Kerala', 'Ladakh', 'Lakshadweep', 'Madhya Pradesh', 'Maharashtra', 'Manipur', 'Meghalaya',
+    'Mizoram', 'Nagaland', 'Odisha', 'Puducherry', 'Punjab', 'Rajasthan', 'Sikkim', 'Tamil Nadu',
+    'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand', 'West Bengal',
+]
+# Transliteration variants folded by phonetic_key (aspirates, w/v, z/j, ...)
+PHONETIC_FOLDS = [('ph', 'f'), ('bh', 'b'), ('dh', 'd'), ('gh', 'g'), ('jh', 'j'), ('kh', 'k'),
+                  ('th', 't'), ('sh', 's'), ('ch', 'c'), ('w', 'v'), ('z', 'j'), ('q', 'k'), ('y', 'i')]
+# Historic names still present in the extracts
+STATE_ALIASES = {
+    'orissa': 'Odisha',
+    'pondicherry': 'Puducherry',
+    'dadra and nagar haveli': 'Dadra and Nagar Haveli and Daman and Diu',
+    'daman and diu': 'Dadra and Nagar Haveli and Daman and Diu',
+}
+
+# Renamed or abbreviated districts; either spelling heals to the one the master uses
+DISTRICT_ALIASES = {
+    'spsr nellore': 'Sri Potti Sriramulu Nellore',
+    'gurugram': 'Gurgaon',
+    'nuh': 'Mewat',
+    'bengaluru urban': 'Bengaluru',
+}
+
+def _state_key(name):
+    """Case-, '&'- and whitespace-insensitive comparison key for a state label."""
+    return "".join(str(name).lower().replace('&', ' and ').split())
+
+_STATE_LOOKUP = {_state_key(s): s for s in CANONICAL_STATES}
+_STATE_LOOKUP.update({_state_key(k): v for k, v in STATE_ALIASES.items()})
+
+@functools.lru_cache(maxsize=None)
+def normalize_state(raw):
+    """Canonical state/UT for a raw label ('WESTBENGAL', 'Orissa'), or None if it is not one ('100000')."""
+    key = _state_key(raw)
+    if key in _STATE_LOOKUP:
+        return _STATE_LOOKUP[key]
+    if not any(c.isalpha() for c in key):
+        return None
+    match = difflib.get_close_matches(key, list(_STATE_LOOKUP), n=1, cutoff=STATE_CUTOFF)
+    return _STATE_LOOKUP[match[0]] if match else None
+
+def char_ngrams(name, sizes):
+    """Character n-grams of a lowercased, space-padded name (with repeats)."""
+    padded = f" {str(name).lower()} "
+    return [padded[i:i + n] for n in sizes for i in range(max(len(padded) - n + 1, 1))]
+
+def name_tokens(name):
+    """Lowercase alphanumeric tokens of a name, with '&' read as 'and' ('Spsr  Nellore*' -> spsr, nellore)."""
+    return re.findall(r'[a-z0-9]+', str(name).lower().replace('&', ' and '))
+
+def name_keys(name, initialisms=False):
+    """
+    Canonical spelling keys of a name: its tokens joined in order and sorted.
+
+    Joining ignores case, punctuation and spacing ('Kushi Nagar' = 'Kushinagar'),
+    sorting ignores word order ('Dinajpur Uttar' = 'Uttar Dinajpur'). With
+    initialisms, names of three or more words also get the key of their
+    abbreviated form ('Shaheed Bhagat Singh Nagar' -> 'sbsnagar').
+    """
+    tokens = name_tokens(name)
+    if not tokens:
+        return set()
+    keys = {"".join(tokens), "".join(sorted(tokens))}
+    if initialisms and len(tokens) >= 3:
+        keys.add("".join(t[0] for t in tokens[:-1]) + tokens[-1])
+    return keys
+
+def phonetic_key(key):
+    """Consonant skeleton of a spelling key: aspirates folded, inner vowels and repeats dropped."""
+    for source, target in PHONETIC_FOLDS:
+        key = key.replace(source, target)
+    skeleton = key[:1] + re.sub(r'[aeiou]', '', key[1:])
+    return re.sub(r'(.)\1+', r'\1', skeleton)
+
+def top_k_per_row(matrix, k, block_cells=1 << 22):
+    """(row, column, value) of the k largest positive entries in every row of a sparse matrix."""
+    matrix = matrix.tocsr()
+    n_rows, n_cols = matrix.shape
+    k = min(k, n_cols)
+    rows, cols, values = [], [], []
+    # Densify a bounded block of rows at a time; argpartition is far cheaper than a full sort
+    step = max(block_cells // max(n_cols, 1), 1)
+    for start in range(0, n_rows, step):
+        block = matrix[start:start + step].toarray()
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_values = np.take_along_axis(block, top, axis=1)
+        r, j = np.nonzero(top_values > 0)
+        rows.append(r + start)
+        cols.append(top[r, j])
+        values.append(top_values[r, j])
+    if not rows:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+class NGramIndex:
+    """
+    Character n-gram inverted index over a list of names.
+
+    Names are lowercased and padded so that word boundaries form their own
+    grams. A lookup only touches the postings of the query's grams and
+    ranks names by the number of grams they share with it.
+    """
+
+    def __init__(self, names, n=NGRAM_SIZE):
+        self.n = n
+        self.names = list(names)
+        self.postings = defaultdict(list)
+        for i, name in enumerate(self.names):
+            for gram in self.grams(name):
+                self.postings[gram].append(i)
+
+    def grams(self, name):
+        return set(char_ngrams(name, (self.n,)))
+
+    def candidates(self, name, limit=CANDIDATE_LIMIT):
+        """Names sharing the most n-grams with the query, best first."""
+        shared = Counter()
+        for gram in self.grams(name):
+            shared.update(self.postings.get(gram, ()))
+        return [self.names[i] for i, _ in shared.most_common(limit)]
+
+class NameKeyIndex:
+    """
+    Hash index from canonical spelling keys to master names.
+
+    Lookups try the exact keys of name_keys (and DISTRICT_ALIASES) first and
+    the phonetic keys ('Purbi Champaran' = 'Purba Champaran') second; each is
+    a dict probe. Phonetic keys are coarse, so their hits must still reach
+    the cutoff on the sorted spelling key ('Kurnool' never becomes 'Karnal').
+    """
+
+    def __init__(self, names, cutoff=MATCH_CUTOFF):
+        self.cutoff = cutoff
+        self.exact = defaultdict(set)
+        self.phonetic = defaultdict(set)
+        self.spellings = {}
+        for name in names:
+            self.spellings[name] = "".join(sorted(name_tokens(name)))
+            for key in name_keys(name, initialisms=True):
+                self.exact[key].add(name)
+                if len(phonetic_key(key)) >= PHONETIC_MIN_LENGTH:
+                    self.phonetic[phonetic_key(key)].add(name)
+        for variant, current in DISTRICT_ALIASES.items():
+            for alias, target in ((variant, current), (current, variant)):
+                if target in self.spellings:
+                    for key in name_keys(alias):
+                        self.exact[key].add(target)
+
+    def lookup(self, name):
+        """(master names sharing a key with the query, sorted; their confidence). Exact keys win."""
+        keys = name_keys(name)
+        found = set().union(*(self.exact.get(key, ()) for key in keys))
+        if found:
+            return sorted(found), KEY_SCORE
+        spelling = "".join(sorted(name_tokens(name)))
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(spelling)
+        for key in {phonetic_key(k) for k in keys}:
+            for candidate in self.phonetic.get(key, ()):
+                matcher.set_seq1(self.spellings[candidate])
+                if matcher.ratio() >= self.cutoff:
+                    found.add(candidate)
+        return sorted(found), PHONETIC_SCORE
+
+class SyntaxBridgeEngine:
+    """
+    Heals dirty district names against a master list.
+
+    Candidates come from an n-gram index built once per master list, so each
+    lookup scores a handful of names with SequenceMatcher instead of the
+    whole list. Scoring follows difflib.get_close_matches (cheap upper
+    bounds first, best ratio wins, cutoff 0.8).
+    
+    Before any fuzzy scoring, a name is looked up in a hash index of the
+    master's normalised and phonetic keys (NameKeyIndex), which settles case,
+    spacing, punctuation, word-order, abbreviation and common transliteration
+    variants in O(1); only names without a key hit reach the n-gram/TF-IDF path.
+
+    When the master list comes with states, lookups that pass a state are
+    blocked to that state's districts (after normalize_state), so a name is
+    never healed into a look-alike district elsewhere. Records whose state
+    is not recognisable fall back to the national list.
+    
+    resolve_many heals a whole batch at once: names and master list become
+    sparse TF-IDF matrices, one sparse product ranks every pair and only the
+    top few master names per name are verified with SequenceMatcher.
+    
+    Key-index heals report a fixed confidence (KEY_SCORE or PHONETIC_SCORE);
+    fuzzy heals report their SequenceMatcher ratio.
+
+    Results, misses included, go through a pluggable cache (an in-memory LRU
+    by default; see resolution_cache for the on-disk backends) bound to a
+    fingerprint of the master list, so a changed master never serves stale heals.
+    """
+
+    def __init__(self, master_list, master_states=None, cutoff=MATCH_CUTOFF, candidates=CANDIDATE_LIMIT,
+                 cache=None):
+        self.valid_districts = set(master_list)
+        self.master_list = list(master_list)
+        self.cutoff = cutoff
+        self.candidate_limit = candidates
+        self.index = NGramIndex(self.master_list)
+        self.keys = {None: NameKeyIndex(self.master_list, cutoff)}
+        self._tfidf = None
+
+        self.fingerprint = master_fingerprint(self.master_list, master_states, cutoff=cutoff,
+                                              candidates=candidates, batch_top_k=BATCH_TOP_K)
+        self.cache = cache if cache is not None else LRUCache()
+        self.cache.bind(self.fingerprint)
+
+        # State blocks: canonical state -> (master positions, valid names, n-gram index)
+        self.blocks = {}
+        if master_states is not None:
+            positions = defaultdict(list)
+            for i, state in enumerate(master_states):
+                canonical = normalize_state(state)
+                if canonical:
+                    positions[canonical].append(i)
+            for state, idx in positions.items():
+                names = [self.master_list[i] for i in idx]
+                self.blocks[state] = (np.array(idx), set(names), NGramIndex(names))
+                self.keys[state] = NameKeyIndex(names, cutoff)
+
+    def _scope(self, state):
+        """(block key, valid names, candidate index, master positions) for a record's state."""
+        canonical = normalize_state(state) if state is not None and self.blocks else None
+        if canonical in self.blocks:
+            positions, valid, index = self.blocks[canonical]
+            return canonical, valid, index, positions
+        return None, self.valid_districts, self.index, None
+
+    def is_valid(self, name, state=None):
+        return name in self._scope(state)[1]
+
+    def best_match(self, dirty_name, candidates=None, index=None):
+        """Closest master name at or above the cutoff (among candidates if given), or None."""
+        if candidates is None:
+            candidates = (index or self.index).candidates(dirty_name, self.candidate_limit)
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(dirty_name)
+        best = None
+        for candidate in candidates:
+            matcher.set_seq1(candidate)
+            if (matcher.real_quick_ratio() >= self.cutoff and matcher.quick_ratio() >= self.cutoff):
+                score = matcher.ratio()
+                if score >= self.cutoff and (best is None or (score, candidate) > best):
+                    best = (score, candidate)
+        return best[1] if best else None
+
+    def key_match(self, dirty_name, block=None):
+        """(match, score, "Healed") for a name sharing a canonical key with a master name in the block, or None."""
+        found, score = self.keys[block].lookup(dirty_name)
+        if not found:
+            return None
+        # Several spellings of one key: keep the closest, as best_match would
+        match = max(found, key=lambda c: (difflib.SequenceMatcher(None, dirty_name, c).ratio(), c))
+        return match, score, "Healed"
+
+    def resolve(self, dirty_name, state=None):
+        block, valid, index, _ = self._scope(state)
+        if dirty_name in valid:
+            return dirty_name, 1.0, "Valid"
+        keyed = self.key_match(dirty_name, block)
+        if keyed:
+            return keyed
+
+        # Cache keys name the lookup path: the n-gram and TF-IDF candidates can disagree
+        cached = self.cache.get(('ngram', block, dirty_name))
+        if cached is not None:
+            return tuple(cached)
+
+        result = self._heal(dirty_name, self.best_match(dirty_name, index=index))
+        self.cache.put(('ngram', block, dirty_name), result)
+        return result
+
+    def _heal(self, dirty_name, match):
+        if match:
+            score = difflib.SequenceMatcher(None, dirty_name, match).ratio()
+            return match, score, "Healed"
+
+        return None, 0.0, "Ghost"
+
+    def _term_counts(self, names, vocabulary, grow=False):
+        """Sparse name x n-gram count matrix; unseen grams are dropped unless grow is set."""
+        rows, cols, counts = [], [], []
+        for r, name in enumerate(names):
+            for gram, count in Counter(char_ngrams(name, TFIDF_NGRAMS)).items():
+                j = vocabulary.setdefault(gram, len(vocabulary)) if grow else vocabulary.get(gram)
+                if j is not None:
+                    rows.append(r)
+                    cols.append(j)
+                    counts.append(count)
+        return sp.csr_matrix((counts, (rows, cols)), shape=(len(names), len(vocabulary)), dtype='float64')
+
+    def _vectorize(self, names, vocabulary, idf):
+        """L2-normalised TF-IDF rows in the master vocabulary."""
+        weighted = self._term_counts(names, vocabulary).multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        return (sp.diags(1.0 / np.where(norms > 0, norms, 1.0)) @ weighted).tocsr()
+
+    def _build_tfidf(self):
+        vocabulary = {}
+        counts = self._term_counts(self.master_list, vocabulary, grow=True)
+        doc_freq = np.bincount(counts.indices, minlength=len(vocabulary))
+        idf = np.log((1 + len(self.master_list)) / (1 + doc_freq)) + 1
+        self._tfidf = (vocabulary, idf, self._vectorize(self.master_list, vocabulary, idf))
+
+    def resolve_many(self, names, states=None, k=BATCH_TOP_K):
+        """
+        Resolves a batch of names in one pass; returns (match, score, status) per name.
+        
+        states optionally gives each name's record state for blocking. TF-IDF
+        cosine similarity only ranks the candidates; fuzzy heals report the
+        same SequenceMatcher ratio that resolve does.
+        """
+        states = [None] * len(names) if states is None else list(states)
+        scopes = [self._scope(state) for state in states]
+
+        results, lookups = {}, {}
+        for name, (block, valid, _, _) in zip(names, scopes):
+            if (block, name) in results or (block, name) in lookups:
+                continue
+            if name in valid:
+                results[(block, name)] = (name, 1.0, "Valid")
+                continue
+            keyed = self.key_match(name, block)
+            if keyed:
+                results[(block, name)] = keyed
+            else:
+                lookups[(block, name)] = None
+        method = f"tfidf{k}"
+        cached = self.cache.get_many([(method, block, name) for block, name in lookups])
+        results.update(((block, name), tuple(value)) for (_, block, name), value in cached.items())
+
+        pending = defaultdict(list)
+        for block, name in lookups:
+            if (block, name) not in results:
+                pending[block].append(name)
+
+        if pending and self._tfidf is None:
+            self._build_tfidf()
+        resolved = {}
+        for block, block_names in pending.items():
+            vocabulary, idf, master = self._tfidf
+            positions = self.blocks[block][0] if block is not None else np.arange(len(self.master_list))
+            similarity = self._vectorize(block_names, vocabulary, idf) @ master[positions].T
+            rows, cols, _ = top_k_per_row(similarity, k)
+            candidates = defaultdict(list)
+            for r, c in zip(rows, positions[cols]):
+                candidates[r].append(self.master_list[c])
+            for r, name in enumerate(block_names):
+                resolved[(block, name)] = self._heal(name, self.best_match(name, candidates[r]))
+
+        if resolved:
+            self.cache.put_many({(method, block, name): value for (block, name), value in resolved.items()})
+            results.update(resolved)
+        return [results[(scope[0], name)] for name, scope in zip(names, scopes)]
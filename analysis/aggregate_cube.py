@@ -0,0 +1,264 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+import time
+import data_loader
+from aggregate_data import STREAM_PREFIXES, stale_streams
+from streaming_stats import CoMoments
+
+# Configuration for directory structure
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(BASE_DIR, "analysis", "results")
+CUBE_DIR = os.path.join(RESULTS_DIR, "cube")
+
+# Finest materialised grain; every rollup below is derived from it
+BASE_LEVELS = ['state', 'district', 'pincode', 'date']
+
+# Precomputed rollups: name -> grouping levels ('month' is derived from 'date')
+ROLLUPS = {
+    'pincode_day': BASE_LEVELS,
+    'district_day': ['state', 'district', 'date'],
+    'district_month': ['state', 'district', 'month'],
+    'state_day': ['state', 'date'],
+    'state_month': ['state', 'month'],
+}
+
+def _encode(values, dictionary):
+    """Maps categorical labels onto stable integer codes, growing the dictionary as needed."""
+    lookup = np.array([dictionary.setdefault(c, len(dictionary)) for c in values.cat.categories] + [-1],
+                      dtype='int32')
+    # Missing labels (code -1) pick the trailing -1 slot
+    return lookup[values.cat.codes.to_numpy()]
+
+def _month(dates):
+    """Truncates datetimes to the first day of their month."""
+    return np.asarray(dates).astype('datetime64[M]').astype('datetime64[ns]')
+
+def _table_digest(directory, name, columns):
+    """SHA-256 over a saved table's column files and specs."""
+    digest = hashlib.sha256(json.dumps(columns, sort_keys=True).encode())
+    for col in columns:
+        with open(os.path.join(directory, f"{name}.{col}.npy"), 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _rollup(base, levels, measures):
+    """Aggregates the base grain up to the requested levels."""
+    frame = base.assign(month=_month(base['date'])) if 'month' in levels else base
+    return frame.groupby(levels, observed=True)[measures].sum().reset_index()
+
+class AggregateCube:
+    """
+    Materialised state x district x pincode x day cube over all three streams.
+
+    Measures are the prefixed age-cohort counts of every stream (enrol_age_0_5,
+    demo_demo_age_17_, ...). Queries are answered from the smallest precomputed
+    rollup that covers the requested filters and grouping levels, so dashboard
+    questions never touch the raw CSVs. shards records the revision of every
+    raw shard the cube was built from (see data_loader.diff_shards).
+    """
+
+    def __init__(self, tables, shards=None):
+        self.tables = tables
+        self.shards = shards or {}
+        self.measures = [c for c in tables['pincode_day'].columns if c not in BASE_LEVELS]
+
+    @classmethod
+    def build(cls, chunksize=data_loader.CHUNK_SIZE):
+        """Streams every shard once and folds it into the base grain and its rollups."""
+        states, districts = {}, {}
+        parts = []
+        shards = {}
+        for key, folder, label in data_loader.STREAMS:
+            print(f"Cubing {label}...")
+            prefix = dict(STREAM_PREFIXES)[key]
+            # Revisions are recorded before the scan, so a shard rewritten mid-build reads as stale
+            shards[folder] = data_loader.diff_shards(folder, {})[2]
+            dropped = 0
+            for chunk in data_loader.iter_dataset(folder, chunksize):
+                # Shards read with inferred dtypes may carry blank pincodes; they have no cell to land in
+                has_pincode = chunk['pincode'].notna()
+                if not has_pincode.all():
+                    dropped += int((~has_pincode).sum())
+                    chunk = chunk[has_pincode]
+                counts = [c for c in chunk.select_dtypes(include=[np.number]).columns if c != 'pincode']
+                frame = pd.DataFrame({
+                    'state': _encode(chunk['state'], states),
+                    'district': _encode(chunk['district'], districts),
+                    'pincode': chunk['pincode'].to_numpy(dtype='int64'),
+                    'date': chunk['date'].to_numpy(),
+                })
+                for c in counts:
+                    # Blank counts (inferred as NaN) contribute nothing
+                    frame[prefix + c] = chunk[c].fillna(0).to_numpy(dtype='int64')
+                # Pre-reduce each chunk so the final merge only sees distinct keys
+                parts.append(frame.groupby(BASE_LEVELS, sort=False).sum())
+            if dropped:
+                print(f"Data Warning: {dropped:,} {label} rows without a pincode were left out of the cube.")
+
+        if not parts:
+            raise ValueError("No shards available to build the aggregate cube.")
+
+        # Streams contribute disjoint measures; missing ones sum as zero
+        base = pd.concat(parts).groupby(level=list(range(len(BASE_LEVELS)))).sum().fillna(0)
+        base = base.astype('int64').reset_index()
+        base['state'] = pd.Categorical.from_codes(base['state'], categories=list(states))
+        base['district'] = pd.Categorical.from_codes(base['district'], categories=list(districts))
+
+        measures = [c for c in base.columns if c not in BASE_LEVELS]
+        tables = {name: base if levels == BASE_LEVELS else _rollup(base, levels, measures)
+                  for name, levels in ROLLUPS.items()}
+        return cls(tables, shards)
+
+    def save(self, path=CUBE_DIR):
+        """
+        Persists every rollup as memory-mappable columns.
+
+        meta.json records each table's row count and content digest next to
+        its column specs, so the file changes whenever the cube data does
+        (pipeline stages use it as their input), plus the shard manifest the
+        cube was built from.
+        """
+        tmp_dir = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        meta = {'tables': {}, 'shards': self.shards}
+        for name, frame in self.tables.items():
+            columns = data_loader.write_columns(frame, tmp_dir, name)
+            meta['tables'][name] = {'rows': len(frame), 'digest': _table_digest(tmp_dir, name, columns),
+                                    'columns': columns}
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_dir, path)
+        print(f"Aggregate cube persisted to {path}")
+
+    @classmethod
+    def load(cls, path=CUBE_DIR):
+        """Memory-maps a persisted cube."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if 'tables' not in meta:
+            raise ValueError(f"Aggregate cube at {path} uses an outdated layout.")
+        return cls({name: data_loader.read_columns(path, name, table['columns'])
+                    for name, table in meta['tables'].items()}, meta.get('shards'))
+
+    def _select_table(self, levels):
+        """Picks the smallest rollup whose levels cover the requested ones."""
+        candidates = []
+        for name, table_levels in ROLLUPS.items():
+            available = set(table_levels) | ({'month'} if 'date' in table_levels else set())
+            if set(levels) <= available:
+                candidates.append((len(self.tables[name]), name))
+        if not candidates:
+            raise ValueError(f"Unknown cube levels requested: {sorted(levels)}")
+        return min(candidates)[1]
+
+    def query(self, by=(), where=None, measures=None):
+        """
+        Answers a filtered, grouped aggregate from the precomputed rollups.
+
+        by: levels to group by, any of state, district, pincode, date, month.
+        where: {level: value or list of values}; dates and months accept any
+        pd.to_datetime input (months match on their calendar month).
+        measures: columns to return, defaulting to every stream's counts.
+        """
+        where = where or {}
+        by = list(by)
+        measures = list(measures or self.measures)
+        name = self._select_table(set(by) | set(where))
+        frame = self.tables[name]
+        if ('month' in by or 'month' in where) and 'month' not in frame.columns:
+            frame = frame.assign(month=_month(frame['date']))
+
+        mask = np.ones(len(frame), dtype=bool)
+        for level, value in where.items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            if level == 'month':
+                values = _month(pd.to_datetime(values))
+            elif level == 'date':
+                values = pd.to_datetime(values)
+            mask &= frame[level].isin(values).to_numpy()
+        subset = frame[mask]
+
+        if not by:
+            return subset[measures].sum().to_frame().T
+        return subset.groupby(by, observed=True)[measures].sum().reset_index()
+
+def stream_totals(cube, table='district_day'):
+    """Collapses a rollup's age-cohort measures into one total per stream."""
+    frame = cube.tables[table]
+    levels = [c for c in frame.columns if c not in cube.measures]
+    totals = frame[levels].copy()
+    for key, prefix in STREAM_PREFIXES:
+        cols = [c for c in cube.measures if c.startswith(prefix)]
+        if cols:
+            totals[f"{key}_total"] = frame[cols].sum(axis=1)
+    return totals
+
+def district_correlations(cube):
+    """
+    Correlates the daily stream totals of every district in one grouped pass.
+
+    Uses per-district co-moment accumulators, so the result can later be merged
+    with accumulators built from other shards or runs without a re-scan.
+    """
+    print("Executing Per-District Correlation Analysis...")
+    totals = stream_totals(cube)
+    cols = [c for c in totals.columns if c.endswith('_total')]
+    acc = CoMoments(cols).update(totals, by=['state', 'district'])
+
+    result = pd.DataFrame({'days': pd.Series(acc.n, index=pd.Index(acc.labels, tupleize_cols=True))})
+    for i, a in enumerate(cols):
+        for b in cols[i + 1:]:
+            result[f"{a}~{b}"] = acc.pair_corr(a, b)
+    result.index.names = ['state', 'district']
+
+    output_path = os.path.join(RESULTS_DIR, "district_correlations.csv")
+    result.to_csv(output_path)
+    print(f"District correlations persisted to {output_path}")
+    return result
+
+def load_cube(refresh=False):
+    """
+    Loads the persisted cube, building it from the raw shards when missing,
+    outdated or on request.
+
+    A cube whose shard manifest no longer matches the raw folders (shards
+    added, changed or removed since the build) is rebuilt as well.
+    """
+    if not refresh and os.path.exists(os.path.join(CUBE_DIR, "meta.json")):
+        try:
+            cube = AggregateCube.load()
+            stale = stale_streams(cube.shards)
+            if not stale:
+                return cube
+            print(f"I/O Warning: Aggregate cube is older than the raw shards of {', '.join(stale)}. Rebuilding.")
+        except ValueError as e:
+            print(f"I/O Warning: {e} Rebuilding.")
+    cube = AggregateCube.build()
+    cube.save()
+    return cube
+
+def main():
+    """Builds the aggregate cube and reports rollup sizes and a sample query latency."""
+    try:
+        start = time.perf_counter()
+        cube = load_cube(refresh=True)
+        print(f"Cube built in {time.perf_counter() - start:.2f}s")
+        for name, frame in cube.tables.items():
+            print(f"    - {name}: {len(frame):,} cells")
+
+        start = time.perf_counter()
+        sample = cube.query(by=['state', 'month'])
+        print(f"State x month rollup answered in {(time.perf_counter() - start) * 1000:.1f} ms ({len(sample)} rows)")
+
+        district_correlations(cube)
+    except Exception as e:
+        print(f"Cube Build Error: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,409 @@
 import pandas as pd
 import numpy as np
 import data_loader
+from streaming_stats import CoMoments
+import json
 import os
+import sys
 
 # Configuration for directory structure
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 OUTPUT_DIR = os.path.join(BASE_DIR, "analysis", "results")
 
-def process_daily_trends(bio, demo, enrol):
-    """Aggregates multi-source datasets into a unified daily time-series."""
-    print("Generating Daily Unified Trends...")
-    
-    # Resample numeric columns to daily sums
-    bio_daily = bio.set_index('date').select_dtypes(include=[np.number]).resample('D').sum().add_prefix('bio_')
-    demo_daily = demo.set_index('date').select_dtypes(include=[np.number]).resample('D').sum().add_prefix('demo_')
-    enrol_daily = enrol.set_index('date').select_dtypes(include=[np.number]).resample('D').sum().add_prefix('enrol_')
-    
+# Incremental ingestion state: per-shard partial aggregates plus a manifest of folded shards
+PARTIALS_DIR = os.path.join(OUTPUT_DIR, "partials")
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "ingest_manifest.json")
+CORRELATION_STATE = os.path.join(PARTIALS_DIR, "daily_correlation_state.npz")
+
+# Column prefixes per stream, in the column order of the persisted outputs
+STREAM_PREFIXES = (('enrol', "enrol_"), ('demo', "demo_"), ('bio', "bio_"))
+
+# Accumulators produced by the fused pass and their index levels
+PARTIAL_TABLES = {
+    'daily': ['date'],
+    'district': ['state', 'district'],
+    'monthly': ['month', 'state', 'district'],
+}
+
+# Persisted outputs of the fused pass, shared with the downstream analysis modules
+OUTPUT_FILES = {
+    'daily': "daily_trends.csv",
+    'district': "district_profile.csv",
+    'monthly': "monthly_profile.csv",
+    'age': "age_trends.csv",
+    'state': "state_profile.csv",
+}
+
+AGE_COLS = ['age_0_5', 'age_5_17', 'age_18_greater']
+
+def daily_partial(df):
+    """Sums the numeric columns of one stream (or shard) per calendar day."""
+    if df.empty:
+        return pd.DataFrame()
+    return df.set_index('date').select_dtypes(include=[np.number]).resample('D').sum()
+
+def district_partial(df):
+    """Sums the count columns of one stream (or shard) per (state, district)."""
+    if df.empty:
+        return pd.DataFrame()
+    # Filter for numeric data, excluding non-aggregatable identifiers like pincode
+    numeric = df.select_dtypes(include=[np.number]).columns
+    cols = [c for c in numeric if c != 'pincode']
+    return df.groupby(['state', 'district'])[cols].sum()
+
+def _plain_index(frame):
+    """Replaces categorical index levels with plain labels so partials from different chunks align."""
+    if isinstance(frame.index, pd.MultiIndex):
+        frame.index = pd.MultiIndex.from_arrays(
+            [level.astype(str) if isinstance(level.dtype, pd.CategoricalDtype) else level
+             for level in (frame.index.get_level_values(i) for i in range(frame.index.nlevels))],
+            names=frame.index.names)
+    return frame
+
+def _fold(acc, part):
+    """Adds a partial aggregate into a running accumulator keyed by its index."""
+    if acc is None or acc.empty:
+        return part
+    if part.empty:
+        return acc
+    return pd.concat([acc, part]).groupby(level=list(range(acc.index.nlevels))).sum()
+
+def fold_chunks(chunks):
+    """
+    Folds a stream of raw chunks into the fused daily, district and monthly accumulators.
+
+    Each chunk is reduced in a single visit to per-date, per-(state, district)
+    and per-(month, state, district) sums and then discarded, so peak memory is
+    bounded by the number of keys rather than the number of rows. The monthly
+    table also carries a row count ('records') per key, from which monthly
+    volumes and active-district counts are derived.
+    """
+    acc = {name: pd.DataFrame() for name in PARTIAL_TABLES}
+    for chunk in chunks:
+        numeric = chunk.select_dtypes(include=[np.number]).columns
+        counts = [c for c in numeric if c != 'pincode']
+        month = pd.Series(chunk['date'].values.astype('datetime64[M]').astype('datetime64[ns]'),
+                          index=chunk.index, name='month')
+
+        acc['daily'] = _fold(acc['daily'], chunk.groupby('date')[list(numeric)].sum())
+        acc['district'] = _fold(acc['district'], _plain_index(
+            chunk.groupby(['state', 'district'], observed=True)[counts].sum()))
+
+        by_month = chunk.groupby([month, 'state', 'district'], observed=True)
+        monthly = by_month[counts].sum()
+        monthly['records'] = by_month.size()
+        acc['monthly'] = _fold(acc['monthly'], _plain_index(monthly))
+    return acc
+
+def build_daily_trends(daily_by_stream):
+    """Consolidates per-stream daily sums into the unified daily time-series and persists it."""
+    frames = []
+    for key, prefix in STREAM_PREFIXES:
+        daily = daily_by_stream.get(key, pd.DataFrame())
+        if not daily.empty:
+            # Re-resample so gaps between merged partials are filled with empty days
+            daily = daily.resample('D').sum()
+        frames.append(daily.add_prefix(prefix))
+
     # Consolidate and fill missing temporal indices
-    daily = pd.concat([enrol_daily, demo_daily, bio_daily], axis=1).fillna(0)
-    
-    output_path = os.path.join(OUTPUT_DIR, "daily_trends.csv")
+    daily = pd.concat(frames, axis=1).fillna(0)
+    daily.index.name = 'date'
+
+    output_path = os.path.join(OUTPUT_DIR, OUTPUT_FILES['daily'])
     daily.to_csv(output_path)
     print(f"Daily trends persisted to {output_path}")
     return daily
 
-def process_district_profile(bio, demo, enrol):
-    """Generates comprehensive district-level profiles across all update types."""
-    print("Generating Regional District Profiles...")
-    
-    def group_df(df, prefix):
-        # Filter for numeric data, excluding non-aggregatable identifiers like pincode
-        numeric = df.select_dtypes(include=[np.number]).columns
-        cols = [c for c in numeric if c != 'pincode']
-        return df.groupby(['state', 'district'])[cols].sum().add_prefix(prefix)
-
-    b_grp = group_df(bio, "bio_")
-    d_grp = group_df(demo, "demo_")
-    e_grp = group_df(enrol, "enrol_")
-    
-    # Outer join to ensure inclusive regional coverage
-    profile = e_grp.join(d_grp, how='outer').join(b_grp, how='outer').fillna(0)
-    
-    output_path = os.path.join(OUTPUT_DIR, "district_profile.csv")
+def _join_streams(by_stream):
+    """Outer-joins per-stream tables sharing an index, prefixing each stream's columns."""
+    joined = None
+    for key, prefix in STREAM_PREFIXES:
+        grp = by_stream.get(key, pd.DataFrame())
+        if grp.empty:
+            continue
+        grp = grp.add_prefix(prefix)
+        # Outer join to ensure inclusive regional coverage
+        joined = grp if joined is None else joined.join(grp, how='outer')
+    return joined.fillna(0) if joined is not None else pd.DataFrame()
+
+def build_district_profile(district_by_stream):
+    """Joins per-stream district sums into the regional profile and persists it."""
+    profile = _join_streams(district_by_stream)
+
+    output_path = os.path.join(OUTPUT_DIR, OUTPUT_FILES['district'])
     profile.to_csv(output_path)
     print(f"Regional profiles persisted to {output_path}")
     return profile
 
-def analyze_correlations(daily_trends):
-    """Calculates Pearson correlation coefficients across transaction indices."""
+def build_monthly_profile(monthly_by_stream):
+    """Joins per-stream (month, state, district) sums and record counts and persists them."""
+    monthly = _join_streams(monthly_by_stream)
+
+    output_path = os.path.join(OUTPUT_DIR, OUTPUT_FILES['monthly'])
+    monthly.to_csv(output_path)
+    print(f"Monthly district profiles persisted to {output_path}")
+    return monthly
+
+def build_age_trends(monthly):
+    """Rolls the monthly profile up to enrolment age-cohort totals per calendar month."""
+    cols = [f"enrol_{c}" for c in AGE_COLS]
+    if monthly.empty or not set(cols) <= set(monthly.columns):
+        return pd.DataFrame(columns=['month', 'month_name'] + AGE_COLS)
+
+    # Only months with enrolment records, as in a groupby over the raw enrolment rows
+    enrol = monthly[monthly['enrol_records'] > 0]
+    months = enrol.index.get_level_values('month')
+    age = enrol[cols].astype('int64').groupby([months.month.rename('month'), months.month_name().rename('month_name')]).sum()
+    age = age.rename(columns=dict(zip(cols, AGE_COLS))).reset_index()
+
+    output_path = os.path.join(OUTPUT_DIR, OUTPUT_FILES['age'])
+    age.to_csv(output_path, index=False)
+    print(f"Age cohort trends persisted to {output_path}")
+    return age
+
+def build_state_profile(profile):
+    """Rolls the district profile up to state totals and persists them."""
+    state = profile.groupby(level='state').sum() if not profile.empty else pd.DataFrame()
+
+    output_path = os.path.join(OUTPUT_DIR, OUTPUT_FILES['state'])
+    state.to_csv(output_path)
+    print(f"State rollups persisted to {output_path}")
+    return state
+
+def build_outputs(by_stream):
+    """Derives and persists every fused output from the per-stream accumulators."""
+    print("Generating Daily Unified Trends...")
+    daily = build_daily_trends({k: v['daily'] for k, v in by_stream.items()})
+    print("Generating Regional District Profiles...")
+    profile = build_district_profile({k: v['district'] for k, v in by_stream.items()})
+    print("Generating Monthly Cohort and State Rollups...")
+    monthly = build_monthly_profile({k: v['monthly'] for k, v in by_stream.items()})
+    build_age_trends(monthly)
+    build_state_profile(profile)
+    return daily
+
+def process_daily_trends(bio, demo, enrol):
+    """Aggregates multi-source datasets into a unified daily time-series."""
+    print("Generating Daily Unified Trends...")
+
+    # Resample numeric columns to daily sums
+    return build_daily_trends({
+        'enrol': daily_partial(enrol),
+        'demo': daily_partial(demo),
+        'bio': daily_partial(bio),
+    })
+
+def process_district_profile(bio, demo, enrol):
+    """Generates comprehensive district-level profiles across all update types."""
+    print("Generating Regional District Profiles...")
+
+    return build_district_profile({
+        'enrol': district_partial(enrol),
+        'demo': district_partial(demo),
+        'bio': district_partial(bio),
+    })
+
+def count_columns(frame):
+    """Selects the transaction count columns, leaving out identifier sums such as pincode."""
+    return [c for c in frame.columns if 'pincode' not in c]
+
+def _changed_days(daily, previous):
+    """Splits revised days into the old rows to retract and the new rows to add."""
+    previous = previous.reindex(columns=daily.columns)
+    common = daily.index.intersection(previous.index)
+    revised = common[(daily.loc[common].astype('float64') != previous.loc[common].astype('float64')).any(axis=1)]
+    retract = previous.loc[previous.index.difference(daily.index).union(revised)]
+    add = daily.loc[daily.index.difference(previous.index).union(revised)]
+    return retract, add
+
+def analyze_correlations(daily_trends, previous=None):
+    """
+    Calculates Pearson correlation coefficients across transaction indices.
+
+    Correlations come from persisted co-moment accumulators over the count
+    columns only. When the previously persisted daily table is passed (as in
+    incremental runs), only revised, new or retired days are folded into the
+    accumulators instead of re-scanning the full series.
+    """
     print("Executing Transactional Correlation Analysis...")
-    corr = daily_trends.corr()
+    cols = count_columns(daily_trends)
+
+    state = None
+    if previous is not None and os.path.exists(CORRELATION_STATE):
+        state = CoMoments.load(CORRELATION_STATE)
+        # Fall back to a rebuild if the accumulators do not describe the previous table
+        if state.columns != cols or state.n.sum() != len(previous):
+            state = None
+
+    if state is None:
+        state = CoMoments(cols).update(daily_trends[cols])
+    else:
+        retract, add = _changed_days(daily_trends[cols], previous)
+        state.remove(retract).update(add)
+        print(f"Correlation accumulators refreshed with {len(add)} new/revised and {len(retract)} retracted day(s).")
+
+    os.makedirs(PARTIALS_DIR, exist_ok=True)
+    state.save(CORRELATION_STATE)
+
+    corr = state.corr()
     output_path = os.path.join(OUTPUT_DIR, "correlations.csv")
     corr.to_csv(output_path)
     print(f"Correlation matrix persisted to {output_path}")
+    return corr
+
+def load_manifest():
+    """Reads the manifest of shards already folded into the persisted results."""
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    """Persists the shard manifest once all partials are safely on disk."""
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def partial_path(shard_name, table):
+    """Locates a persisted partial accumulator of a shard."""
+    return os.path.join(PARTIALS_DIR, f"{shard_name}.{table}.csv")
+
+def _remove_partials(shard_name):
+    """Deletes whatever partial accumulators a shard has on disk."""
+    for table in PARTIAL_TABLES:
+        if os.path.exists(partial_path(shard_name, table)):
+            os.remove(partial_path(shard_name, table))
+
+def refresh_partials(folder_name, manifest):
+    """Re-aggregates only the new or changed shards of a stream and drops partials of removed ones."""
+    known = manifest.get(folder_name, {})
+    # Shards whose partials are incomplete (e.g. written by an older release) are folded again
+    complete = {name: sig for name, sig in known.items()
+                if all(os.path.exists(partial_path(name, t)) for t in PARTIAL_TABLES)}
+    changed, _, current = data_loader.diff_shards(folder_name, complete)
+
+    failed = []
+    for f in changed:
+        name = os.path.basename(f)
+        print(f"Folding new shard {name}...")
+        try:
+            tables = fold_chunks(data_loader.open_shard(f))
+        except Exception as e:
+            # Left out of the manifest, so the next refresh retries it; the other shards still fold
+            print(f"Data Read Error: Failed to process {f}. Details: {e}")
+            failed.append(name)
+            _remove_partials(name)
+            continue
+        for table, frame in tables.items():
+            if frame.empty:
+                # A header-only shard leaves an empty marker, which merge_partials skips
+                open(partial_path(name, table), "w").close()
+            else:
+                frame.to_csv(partial_path(name, table))
+
+    for name in sorted(set(known) - set(current)):
+        print(f"Retiring shard {name}...")
+        _remove_partials(name)
+
+    for name in failed:
+        del current[name]
+    manifest[folder_name] = current
+    return len(changed) - len(failed), sorted(current)
+
+def merge_partials(shard_names):
+    """Sums the persisted partials of a stream's shards into stream-level accumulators."""
+    merged = {}
+    for table, levels in PARTIAL_TABLES.items():
+        dates = [lvl for lvl in levels if lvl in ('date', 'month')]
+        paths = [partial_path(n, table) for n in shard_names]
+        parts = [pd.read_csv(p, index_col=levels, parse_dates=dates) for p in paths if os.path.getsize(p)]
+        parts = [p for p in parts if not p.empty]
+        merged[table] = pd.concat(parts).groupby(level=list(range(len(levels)))).sum() if parts else pd.DataFrame()
+    return merged
+
+def run_incremental():
+    """
+    Folds only newly arrived or changed shards into the persisted results.
+
+    Each shard is aggregated once into daily, district and monthly partials
+    under results/partials; a refresh re-parses just the shards missing from
+    the manifest and re-sums the small partial tables, so its cost tracks the
+    new data rather than the full history.
+    """
+    os.makedirs(PARTIALS_DIR, exist_ok=True)
+    manifest = load_manifest()
+
+    by_stream = {}
+    folded = 0
+    for key, folder, label in data_loader.STREAMS:
+        print(f"Scanning {label} for new shards...")
+        n_changed, shard_names = refresh_partials(folder, manifest)
+        folded += n_changed
+        by_stream[key] = merge_partials(shard_names)
+
+    save_manifest(manifest)
+    print(f"Incremental refresh folded {folded} shard(s).")
+    return build_outputs(by_stream)
+
+def run_streaming():
+    """Rebuilds every fused output with a single chunked pass over each stream."""
+    manifest = load_manifest()
+    by_stream = {}
+    for key, folder, label in data_loader.STREAMS:
+        print(f"Folding {label}...")
+        # Shard revisions are recorded before the pass, so a shard rewritten mid-scan reads as stale
+        manifest[folder] = data_loader.diff_shards(folder, {})[2]
+        by_stream[key] = fold_chunks(data_loader.iter_dataset(folder))
+    daily = build_outputs(by_stream)
+    save_manifest(manifest)
+    return daily
+
+def stale_streams(manifest):
+    """Labels of the streams whose shards were added, changed or removed since the manifest was written."""
+    stale = []
+    for _, folder, label in data_loader.STREAMS:
+        changed, removed, _ = data_loader.diff_shards(folder, manifest.get(folder, {}))
+        if changed or removed or folder not in manifest:
+            stale.append(label)
+    return stale
+
+def load_aggregates(refresh=False):
+    """
+    Reads the fused aggregation outputs for downstream modules.
+
+    Runs the fused pass first when asked to or when any output is missing, and
+    folds in new or changed shards when the ingest manifest no longer matches
+    the raw folders, so callers never read results older than the data.
+    """
+    paths = {name: os.path.join(OUTPUT_DIR, f) for name, f in OUTPUT_FILES.items()}
+    if refresh or not all(os.path.exists(p) for p in paths.values()):
+        analyze_correlations(run_streaming())
+    else:
+        stale = stale_streams(load_manifest())
+        if stale:
+            print(f"Aggregates are older than the raw shards of {', '.join(stale)}; refreshing...")
+            previous = pd.read_csv(paths['daily'], index_col='date', parse_dates=['date'])
+            analyze_correlations(run_incremental(), previous)
+
+    return {
+        'daily': pd.read_csv(paths['daily'], index_col='date', parse_dates=['date']),
+        'district': pd.read_csv(paths['district']),
+        'monthly': pd.read_csv(paths['monthly'], parse_dates=['month']),
+        'age': pd.read_csv(paths['age']),
+        'state': pd.read_csv(paths['state']),
+    }
 
-def main():
+def main(incremental=False):
     """Execution entry point for the data aggregation pipeline."""
     try:
-        bio, demo, enrol = data_loader.load_all()
-        daily = process_daily_trends(bio, demo, enrol)
-        process_district_profile(bio, demo, enrol)
-        analyze_correlations(daily)
+        daily_path = os.path.join(OUTPUT_DIR, OUTPUT_FILES['daily'])
+        previous = None
+        if incremental and os.path.exists(daily_path):
+            previous = pd.read_csv(daily_path, index_col='date', parse_dates=['date'])
+        daily = run_incremental() if incremental else run_streaming()
+        analyze_correlations(daily, previous)
         print("Data processing pipeline completed successfully.")
     except Exception as e:
         print(f"Pipeline Execution Error: {e}")
 
 if __name__ == "__main__":
-    main()
+    main(incremental='--incremental' in sys.argv)
@@ -1,12 +1,53 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import data_loader
+from aggregate_cube import load_cube, stream_totals
+from streaming_stats import QuantileSketch, SpaceSaving
 
 # Configuration
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 DISTRICT_PROFILE = os.path.join(BASE_DIR, "analysis", "results", "district_profile.csv")
 OUTPUT_DIR = os.path.join(BASE_DIR, "analysis", "results")
 THRESH_ENROL_MIN = 1000  # Minimum records to be statistically significant
+IQR_MULTIPLIER = 1.5  # Tukey fence width
+MAD_SCALE = 1.4826  # Makes MAD consistent with the standard deviation
+MIN_GROUP_SIZE = 8  # Smaller groups fall back to the national bounds
+GROUP_BY = ['state']
+# Optional district size bands (total enrolment), used when 'size_band' is grouped on
+SIZE_BANDS = [0, THRESH_ENROL_MIN, 10 * THRESH_ENROL_MIN, np.inf]
+SIZE_BAND_LABELS = ['small', 'medium', 'large']
+PANEL_WINDOW = 7  # Trailing batch days forming each rolling baseline
+PANEL_Z_THRESH = 3.5  # Modified z-score cut-off (Iglewicz & Hoaglin)
+HEAVY_HITTER_CAPACITY = 2000  # Counters kept per stream and grain
+HEAVY_HITTER_TOP_K = 25
+DAY_SPAN = 100_000  # Days since epoch fit below this, so (entity, day) packs into one int64
+
+# Declarative classification rules, evaluated in priority order (first match wins).
+# Each condition is (column, operator, operand); a string operand names a rule
+# parameter first and a frame column otherwise, so bounds can be scalars or per-row.
+CLASSIFICATION_RULES = [
+    # PRIORITY 1: Structural Failures (Ghost Districts)
+    # High Enrolment but ZERO updates. This is a nomenclature break, not a stat outlier.
+    {'id': 'GHOST_ZERO_UPDATES', 'label': 'Ghost District (Nomenclature Failure)',
+     'when': [('total_enrol', '>', 'enrol_min'), ('total_updates', '==', 0)]},
+    # PRIORITY 2: Statistical High Anomalies (Potential Dumping/Fraud)
+    {'id': 'HIGH_INTENSITY_IQR', 'label': 'High-Volume Anomaly (Check Vendor)',
+     'when': [('update_intensity', '>', 'upper_bound'), ('total_enrol', '>', 'enrol_min')]},
+    # PRIORITY 3: Active but abnormally quiet update pipelines
+    {'id': 'LOW_INTENSITY_IQR', 'label': 'Low-Intensity Anomaly (Update Backlog)',
+     'when': [('update_intensity', '<', 'lower_bound'), ('total_enrol', '>', 'enrol_min'),
+              ('total_updates', '>', 0)]},
+]
+DEFAULT_LABEL = 'Normal'
+DEFAULT_RULE_ID = 'DEFAULT'
+
+OPERATORS = {
+    '>': np.greater, '>=': np.greater_equal,
+    '<': np.less, '<=': np.less_equal,
+    '==': np.equal, '!=': np.not_equal,
+}
 
 def load_data():
     """Load district profile for analysis."""
@@ -16,7 +57,93 @@ def load_data():
         return None
     return pd.read_csv(DISTRICT_PROFILE)
 
-def robust_anomaly_detection(df):
+def _operand(value, df, params):
+    """Resolves a rule operand to a scalar parameter, a column array or a literal."""
+    if isinstance(value, str):
+        if value in params:
+            return params[value]
+        if value in df.columns:
+            return df[value].to_numpy()
+        raise KeyError(f"Rule operand '{value}' is neither a parameter nor a column.")
+    return value
+
+def apply_rules(df, params, rules=CLASSIFICATION_RULES):
+    """
+    Evaluates the declarative rules as vectorized boolean masks.
+    
+    Returns (classification, rule_id) Series aligned with df; rows matching
+    no rule get DEFAULT_LABEL / DEFAULT_RULE_ID.
+    """
+    masks = []
+    for rule in rules:
+        mask = np.ones(len(df), dtype=bool)
+        for column, op, operand in rule['when']:
+            mask &= OPERATORS[op](df[column].to_numpy(), _operand(operand, df, params))
+        masks.append(mask)
+
+    # np.select picks the first True mask per row, i.e. rule priority order
+    classification = np.select(masks, [r['label'] for r in rules], default=DEFAULT_LABEL)
+    rule_id = np.select(masks, [r['id'] for r in rules], default=DEFAULT_RULE_ID)
+    return (pd.Series(classification, index=df.index, name='classification'),
+            pd.Series(rule_id, index=df.index, name='rule_id'))
+
+def _sorted_quantile(values, starts, counts, q):
+    """Linear-interpolated quantile of every group in a group-sorted value array."""
+    pos = starts + q * np.maximum(counts - 1, 0)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, starts + np.maximum(counts - 1, 0))
+    lo, hi = np.minimum(lo, len(values) - 1), np.minimum(hi, len(values) - 1)
+    result = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+    return np.where(counts > 0, result, np.nan)
+
+def grouped_robust_stats(df, value, by):
+    """
+    Q1, median, Q3, IQR and MAD of a column for every group in one vectorized pass.
+    
+    Rows are sorted once by (group, value), so all group quantiles are read off
+    by position; the MAD needs a second sort of the absolute deviations only.
+    Returns one row per group (indexed by the group keys) with the row count.
+    """
+    keys = df[by]
+    codes, uniques = pd.factorize(pd.MultiIndex.from_frame(keys) if len(by) > 1 else keys[by[0]])
+    values = df[value].to_numpy(dtype='float64')
+    G = len(uniques)
+    counts = np.bincount(codes, minlength=G)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    ordered = values[np.lexsort((values, codes))]
+    q1, median, q3 = (_sorted_quantile(ordered, starts, counts, q) for q in (0.25, 0.5, 0.75))
+
+    deviation = np.abs(values - median[codes])
+    mad = _sorted_quantile(deviation[np.lexsort((deviation, codes))], starts, counts, 0.5)
+
+    index = uniques if len(by) > 1 else pd.Index(uniques, name=by[0])
+    if len(by) > 1:
+        index.names = by
+    return pd.DataFrame({'n': counts, 'q1': q1, 'median': median, 'q3': q3,
+                         'iqr': q3 - q1, 'mad': mad}, index=index)
+
+def group_bounds(df, value, by, k=IQR_MULTIPLIER, min_size=MIN_GROUP_SIZE):
+    """
+    Per-group IQR fences with a national fallback for groups too small to calibrate.
+    
+    Statistics come from active rows (positive updates) only. Returns the
+    per-group table and the national statistics as a Series.
+    """
+    active = df[df['total_updates'] > 0]
+    stats = grouped_robust_stats(active, value, by)
+    national = grouped_robust_stats(active.assign(_all='ALL'), value, ['_all']).iloc[0]
+
+    small = stats['n'] < min_size
+    for col in ['q1', 'median', 'q3', 'iqr', 'mad']:
+        stats.loc[small, col] = national[col]
+    stats['fallback'] = small
+    for frame in (stats, national):
+        frame['lower_bound'] = frame['q1'] - k * frame['iqr']
+        frame['upper_bound'] = frame['q3'] + k * frame['iqr']
+    return stats, national
+
+def robust_anomaly_detection(df, by=GROUP_BY):
     """
     Implements Robust IQR (Interquartile Range) Method.
     
@@ -27,6 +154,10 @@ def robust_anomaly_detection(df):
     
     Robust IQR uses Median Absolute Deviation logic to isolate true structural 
     outliers (Ghost Districts) without false positives on high-density centers.
+    
+    Bounds are calibrated per group (state by default, optionally also by
+    'size_band'), so each district is judged against comparable peers.
+    Works unchanged on district x month panels.
     """
     
     # 1. Feature Engineering: Update Intensity
@@ -40,46 +171,287 @@ def robust_anomaly_detection(df):
     # Avoid division by zero
     df['update_intensity'] = df['total_updates'] / (df['total_enrol'] + 1)
     
+    if 'size_band' in by:
+        df['size_band'] = pd.cut(df['total_enrol'], SIZE_BANDS, labels=SIZE_BAND_LABELS,
+                                 include_lowest=True).astype(str)
+    
     # 2. ROBUST STATISTICAL PARAMETERS (The "Pro" Logic)
     # We focus on the distribution of ACTIVE districts to find the 'Normal' range
-    active_districts = df[df['total_updates'] > 0]
-    
-    if active_districts.empty:
+    if not (df['total_updates'] > 0).any():
         return df, pd.DataFrame()
 
-    Q1 = active_districts['update_intensity'].quantile(0.25)
-    Q3 = active_districts['update_intensity'].quantile(0.75)
-    IQR = Q3 - Q1
-    
-    # Define Bounds (1.5x IQR is standard statistical practice)
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
+    bounds, national = group_bounds(df, 'update_intensity', list(by))
     
     print(f"--- Statistical Calibration ---")
-    print(f"Distribution skew detected. Applying Robust Estimators.")
-    print(f"Q1: {Q1:.4f} | Q3: {Q3:.4f} | IQR: {IQR:.4f}")
-    print(f"Anomaly Thresholds -> Low: {lower_bound:.4f} | High: {upper_bound:.4f}")
-
-    # 3. CLASSIFICATION LOGIC
-    def classify_district(row):
-        # PRIORITY 1: Structural Failures (Ghost Districts)
-        # High Enrolment but ZERO updates. This is a nomenclature break, not a stat outlier.
-        if row['total_enrol'] > THRESH_ENROL_MIN and row['total_updates'] == 0:
-            return 'Ghost District (Nomenclature Failure)'
-        
-        # PRIORITY 2: Statistical High Anomalies (Potential Dumping/Fraud)
-        if row['update_intensity'] > upper_bound and row['total_enrol'] > THRESH_ENROL_MIN:
-            return 'High-Volume Anomaly (Check Vendor)'
-            
-        return 'Normal'
+    print(f"Distribution skew detected. Applying Robust Estimators per {' x '.join(by)}.")
+    print(f"National Q1: {national['q1']:.4f} | Q3: {national['q3']:.4f} | IQR: {national['iqr']:.4f}")
+    print(f"Groups calibrated: {int((~bounds['fallback']).sum())} | "
+          f"National fallback (< {MIN_GROUP_SIZE} active districts): {int(bounds['fallback'].sum())}")
+
+    # Broadcast each group's bounds onto its districts (unseen groups use national bounds)
+    per_row = df[list(by)].join(bounds, on=list(by))
+    for col in ['median', 'mad', 'lower_bound', 'upper_bound']:
+        df[col] = per_row[col].fillna(national[col]).to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['robust_z'] = (df['update_intensity'] - df['median']) / (MAD_SCALE * df['mad'])
 
-    df['classification'] = df.apply(classify_district, axis=1)
+    # 3. CLASSIFICATION LOGIC (declarative rules, first match wins; bounds are per-row columns)
+    params = {'enrol_min': THRESH_ENROL_MIN}
+    df['classification'], df['rule_id'] = apply_rules(df, params)
     
     # Extract the Ghosts for the report
     ghosts = df[df['classification'].str.contains('Ghost')].copy()
     
     return df, ghosts
 
+class StreamingAnomalyDetector:
+    """
+    Online district scoring while shard chunks stream in.
+    
+    Keeps running enrolment/update totals per district and mergeable quantile
+    sketches of update intensity (national and per state). When a chunk
+    revises a district's totals, its old intensity is retracted from the
+    sketches and the new one added, so the IQR bounds follow the data without
+    re-reading the profile. Districts are reported as soon as a rule fires.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_size=MIN_GROUP_SIZE, k=IQR_MULTIPLIER):
+        self.relative_accuracy = relative_accuracy
+        self.min_size = min_size
+        self.k = k
+        self.totals = pd.DataFrame({'total_enrol': [], 'total_updates': []},
+                                   index=pd.MultiIndex.from_tuples([], names=['state', 'district']))
+        self.national = QuantileSketch(relative_accuracy)
+        self.by_state = {}
+        self.rule_ids = pd.Series(dtype=object)
+
+    @staticmethod
+    def _intensity(totals):
+        return totals['total_updates'] / (totals['total_enrol'] + 1)
+
+    def _fold_sketches(self, totals, sign):
+        """Adds (sign=1) or retracts (sign=-1) the intensities of active districts."""
+        active = totals[totals['total_updates'] > 0]
+        if active.empty:
+            return
+        intensity = self._intensity(active)
+        method = 'update' if sign > 0 else 'remove'
+        getattr(self.national, method)(intensity.to_numpy())
+        for state, values in intensity.groupby(level='state'):
+            sketch = self.by_state.setdefault(state, QuantileSketch(self.relative_accuracy))
+            getattr(sketch, method)(values.to_numpy())
+
+    def update(self, chunk, stream):
+        """Folds one standardized shard chunk of a stream ('enrol', 'demo' or 'bio')."""
+        counts = [c for c in chunk.columns if 'age_' in c]
+        column = 'total_enrol' if stream == 'enrol' else 'total_updates'
+        batch = chunk.groupby(['state', 'district'], observed=True)[counts].sum().sum(axis=1)
+        if batch.empty:
+            return self.evaluate()
+        batch.index = pd.MultiIndex.from_arrays(
+            [batch.index.get_level_values(i).astype(str) for i in range(2)], names=['state', 'district'])
+
+        known = batch.index.intersection(self.totals.index)
+        self._fold_sketches(self.totals.loc[known], -1)
+        delta = batch.to_frame(column).reindex(columns=self.totals.columns, fill_value=0)
+        self.totals = self.totals.add(delta, fill_value=0)
+        self._fold_sketches(self.totals.loc[batch.index], 1)
+        return self.evaluate()
+
+    def bounds(self):
+        """Current per-state IQR fences (national fences for thinly populated states)."""
+        q1, q3 = self.national.quantiles([0.25, 0.75])
+        national = (q1 - self.k * (q3 - q1), q3 + self.k * (q3 - q1))
+        rows = {}
+        for state, sketch in self.by_state.items():
+            if sketch.count >= self.min_size:
+                q1, q3 = sketch.quantiles([0.25, 0.75])
+                rows[state] = (q1 - self.k * (q3 - q1), q3 + self.k * (q3 - q1))
+            else:
+                rows[state] = national
+        return pd.DataFrame.from_dict(rows, orient='index', columns=['lower_bound', 'upper_bound']), national
+
+    def evaluate(self):
+        """Scores every district against the current bounds; returns the newly flagged ones."""
+        frame = self.totals.copy()
+        frame['update_intensity'] = self._intensity(frame)
+        bounds, national = self.bounds()
+        states = frame.index.get_level_values('state')
+        for col, fallback in zip(['lower_bound', 'upper_bound'], national):
+            frame[col] = states.map(bounds[col]).to_numpy() if len(bounds) else fallback
+            frame[col] = frame[col].fillna(fallback)
+
+        frame['classification'], frame['rule_id'] = apply_rules(frame, {'enrol_min': THRESH_ENROL_MIN})
+        previous = self.rule_ids.reindex(frame.index)
+        flagged = (frame['rule_id'] != DEFAULT_RULE_ID) & (frame['rule_id'] != previous)
+        self.rule_ids = frame['rule_id']
+        return frame[flagged]
+
+def run_streaming_detection(chunksize=data_loader.CHUNK_SIZE):
+    """Streams every shard through the online detector, printing alerts as they fire."""
+    detector = StreamingAnomalyDetector()
+    for key, folder, label in data_loader.STREAMS:
+        print(f"Streaming {label}...")
+        for chunk in data_loader.iter_dataset(folder, chunksize):
+            for (state, district), row in detector.update(chunk, key).iterrows():
+                print(f"[ALERT] {district}, {state}: {row['classification']} "
+                      f"(intensity {row['update_intensity']:.2f}, bounds "
+                      f"{row['lower_bound']:.2f}..{row['upper_bound']:.2f})")
+    flagged = int((detector.rule_ids != DEFAULT_RULE_ID).sum())
+    print(f"Streaming audit complete: {len(detector.totals)} districts tracked, {flagged} currently flagged.")
+    return detector
+
+def district_day_panel(cube):
+    """
+    Dense stream x district x day count array from the cube's district_day rollup.
+    
+    The day axis holds the observed batch dates (not every calendar day), so a
+    district absent from a batch that other districts reported counts as zero.
+    Returns (panel, streams, districts as a (state, district) MultiIndex, dates).
+    """
+    totals = stream_totals(cube, 'district_day')
+    streams = [c for c in totals.columns if c.endswith('_total')]
+    district_codes, districts = pd.factorize(pd.MultiIndex.from_frame(
+        totals[['state', 'district']].astype(str)))
+    date_codes, dates = pd.factorize(totals['date'], sort=True)
+
+    panel = np.zeros((len(streams), len(districts), len(dates)))
+    # district_day keys are unique, so plain fancy assignment places every cell
+    panel[:, district_codes, date_codes] = totals[streams].to_numpy(dtype='float64').T
+    return panel, [c[:-len('_total')] for c in streams], districts, pd.DatetimeIndex(dates)
+
+def rolling_panel_anomalies(cube=None, window=PANEL_WINDOW, threshold=PANEL_Z_THRESH):
+    """
+    Flags district-day bursts against each district's own trailing baseline.
+    
+    For every stream, district and day at once, the baseline is the median of
+    the previous `window` batch days and the spread their MAD; days whose
+    modified z-score rises to the threshold are returned as hits. Only
+    upward bursts count: drops, and days a district was absent from a batch
+    (zero-filled in the panel), are never flagged. Baselines with fewer than
+    half the window active are skipped, and the scale is floored at one
+    record so near-silent districts do not explode.
+    """
+    panel, streams, districts, dates = district_day_panel(cube if cube is not None else load_cube())
+    if len(dates) <= window:
+        return pd.DataFrame(columns=['state', 'district', 'stream', 'date', 'value', 'baseline', 'score'])
+
+    # (stream, district, target day, window) views; the last window would cover the final day itself
+    history = np.lib.stride_tricks.sliding_window_view(panel, window, axis=2)[:, :, :-1]
+    target = panel[:, :, window:]
+    baseline = np.median(history, axis=-1)
+    mad = np.median(np.abs(history - baseline[..., None]), axis=-1)
+    score = (target - baseline) / np.maximum(MAD_SCALE * mad, 1.0)
+
+    enough_history = (history > 0).sum(axis=-1) >= (window + 1) // 2
+    s, d, t = np.nonzero(enough_history & (target > 0) & (score >= threshold))
+    hits = pd.DataFrame({
+        'state': districts.get_level_values(0)[d],
+        'district': districts.get_level_values(1)[d],
+        'stream': np.asarray(streams)[s],
+        'date': dates[t + window],
+        'value': target[s, d, t].astype('int64'),
+        'baseline': baseline[s, d, t],
+        'score': score[s, d, t],
+    })
+    return hits.sort_values('score', ascending=False, ignore_index=True)
+
+def run_panel_detection(window=PANEL_WINDOW, threshold=PANEL_Z_THRESH):
+    """Runs the rolling district x day scan and exports its hits."""
+    hits = rolling_panel_anomalies(window=window, threshold=threshold)
+    output_path = os.path.join(OUTPUT_DIR, "panel_anomalies.csv")
+    hits.to_csv(output_path, index=False)
+    print(f"Rolling {window}-day panel scan: {len(hits)} district-day bursts (z >= {threshold}).")
+    print(hits.head(10).to_string(index=False))
+    print(f"Panel hits exported to {output_path}")
+    return hits
+
+class HeavyHitterScan:
+    """
+    Bounded-memory bulk-submission finder over (pincode, day) and (district, day).
+    
+    Each stream keeps one Space-Saving summary per grain, so the heaviest
+    submission cells surface while shards stream in without materialising
+    the full pincode x day table. District labels get stable integer codes.
+    """
+
+    GRAINS = ('pincode_day', 'district_day')
+
+    def __init__(self, capacity=HEAVY_HITTER_CAPACITY):
+        self.capacity = capacity
+        self.sketches = {}
+        self._district_codes = {}
+
+    def _districts(self, chunk):
+        """Stable global codes for the (state, district) pair of every row."""
+        codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([chunk['state'].astype(str),
+                                                                chunk['district'].astype(str)]))
+        lookup = np.array([self._district_codes.setdefault(p, len(self._district_codes)) for p in pairs],
+                          dtype=np.int64)
+        return lookup[codes]
+
+    def update(self, chunk, stream):
+        counts = [c for c in chunk.columns if 'age_' in c]
+        valid = chunk['date'].notna().to_numpy()
+        chunk = chunk[valid]
+        day = chunk['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        # Blank counts (NaN in shards read with inferred dtypes) add nothing
+        volume = np.nansum(chunk[counts].to_numpy(dtype='float64'), axis=1)
+        # Rows without a pincode still count towards their district
+        has_pincode = chunk['pincode'].notna().to_numpy()
+        pincode = chunk['pincode'].to_numpy(dtype='float64')[has_pincode].astype(np.int64)
+        cells = {
+            'pincode_day': (pincode * DAY_SPAN + day[has_pincode], volume[has_pincode]),
+            'district_day': (self._districts(chunk) * DAY_SPAN + day, volume),
+        }
+        for grain in self.GRAINS:
+            sketch = self.sketches.setdefault((stream, grain), SpaceSaving(self.capacity))
+            sketch.update(*cells[grain])
+        return self
+
+    def top(self, k=HEAVY_HITTER_TOP_K):
+        """Top-k cells per stream and grain, decoded, with their share of the stream."""
+        frames = []
+        district_labels = list(self._district_codes)
+        for (stream, grain), sketch in self.sketches.items():
+            top = sketch.top(k)
+            entity, day = np.divmod(top['key'].to_numpy(), DAY_SPAN)
+            frame = pd.DataFrame({'stream': stream, 'grain': grain,
+                                  'date': day.astype('datetime64[D]').astype('datetime64[ns]')})
+            if grain == 'pincode_day':
+                frame['state'], frame['district'], frame['pincode'] = None, None, entity
+            else:
+                labels = [district_labels[e] for e in entity]
+                frame['state'] = [l[0] for l in labels]
+                frame['district'] = [l[1] for l in labels]
+                frame['pincode'] = None
+            frame['records'] = top['count'].astype('int64')
+            frame['max_overcount'] = top['error'].astype('int64')
+            frame['share'] = top['count'] / max(sketch.total, 1)
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)[
+            ['stream', 'grain', 'state', 'district', 'pincode', 'date', 'records', 'max_overcount', 'share']]
+
+def run_heavy_hitter_scan(chunksize=data_loader.CHUNK_SIZE, k=HEAVY_HITTER_TOP_K):
+    """Streams every shard through the heavy-hitter summaries and exports the top cells."""
+    scan = HeavyHitterScan()
+    for key, folder, label in data_loader.STREAMS:
+        print(f"Scanning {label} for bulk submissions...")
+        for chunk in data_loader.iter_dataset(folder, chunksize):
+            scan.update(chunk, key)
+
+    hits = scan.top(k)
+    output_path = os.path.join(OUTPUT_DIR, "heavy_hitters.csv")
+    hits.to_csv(output_path, index=False)
+    for (stream, grain), group in hits.groupby(['stream', 'grain'], sort=False):
+        print(f"--- Top {stream} submissions by {grain} ---")
+        print(group.head(5).drop(columns=['stream', 'grain']).to_string(index=False))
+    print(f"Heavy hitters exported to {output_path}")
+    return hits
+
 def generate_audit_report(ghosts, full_df):
     """
     Generates a Data Science Audit Report.
@@ -148,4 +520,11 @@ def main():
         print(f"[CRITICAL FAILURE] Analysis aborted: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if '--stream' in sys.argv:
+        run_streaming_detection()
+    elif '--panel' in sys.argv:
+        run_panel_detection()
+    elif '--heavy' in sys.argv:
+        run_heavy_hitter_scan()
+    else:
+        main()
\ No newline at end of file
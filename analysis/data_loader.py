@@ -1,55 +1,395 @@
 import pandas as pd
+import numpy as np
 import glob
+import hashlib
+import json
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 
 # Configuration for dataset directory
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'UIDIA-Datasets'))
 
-def load_dataset(folder_name):
-    """Memory-efficient loading and standardizing of CSV datasets from a specified folder."""
+# Streaming configuration: rows per chunk and compact storage types
+CHUNK_SIZE = 100_000
+CATEGORY_COLUMNS = ('state', 'district')
+PINCODE_DTYPE = 'int32'
+COUNT_DTYPE = 'uint32'  # Age-cohort counts are non-negative and far below 2^32
+DATE_FORMAT = '%d-%m-%Y'
+
+# Core transaction streams in ingestion order: (key, folder, description)
+STREAMS = (
+    ('bio', "api_data_aadhar_biometric", "Biometric Transaction Logs"),
+    ('demo', "api_data_aadhar_demographic", "Demographic Update Logs"),
+    ('enrol', "api_data_aadhar_enrolment", "Enrolment Registry Logs"),
+)
+
+# Columnar shard cache: one memory-mappable .npy file per column and part
+CACHE_DIR = os.path.join(BASE_DIR, '.cache')
+CACHE_VERSION = 2  # Bump whenever parsing changes, so entries written by older code are not served
+
+def list_shards(folder_name):
+    """Lists the CSV shards of a dataset folder in a stable order."""
     path = os.path.join(BASE_DIR, folder_name, "*.csv")
-    files = glob.glob(path)
+    return sorted(glob.glob(path))
+
+def shard_dtypes(path, strict=True):
+    """
+    Maps the raw header of a CSV shard to compact column dtypes.
+    
+    Without strict, pincode and count columns are left for pandas to infer
+    (float64 when cells are blank); labels and dates stay categorical.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {}
+    for raw in header:
+        name = raw.strip().lower()
+        if name in CATEGORY_COLUMNS or name == 'date':
+            # Dates are read as categories so each distinct string is decoded once
+            dtypes[raw] = 'category'
+        elif name == 'pincode' and strict:
+            dtypes[raw] = PINCODE_DTYPE
+        elif 'age_' in name and strict:
+            dtypes[raw] = COUNT_DTYPE
+    return dtypes
+
+# Decoded dates shared across chunks and shards (the feed holds a few hundred distinct days)
+_DATE_MEMO = {}
+_DATE_MEMO_LIMIT = 100_000
+
+def parse_dates(values):
+    """
+    Decodes dd-mm-yyyy strings by parsing each distinct value once.
+    
+    Distinct strings are decoded with an explicit format (memoized across calls)
+    and broadcast back to the rows through their codes. Rows whose date cannot
+    be decoded become NaT and are counted in a warning rather than dropped silently.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    
+    pending = [u for u in uniques if u not in _DATE_MEMO]
+    decoded = {}
+    if pending:
+        parsed = pd.to_datetime(pd.Index(pending, dtype=object), format=DATE_FORMAT, errors='coerce')
+        decoded = dict(zip(pending, parsed.to_numpy(dtype='datetime64[ns]')))
+        if len(_DATE_MEMO) < _DATE_MEMO_LIMIT:
+            _DATE_MEMO.update(decoded)
+    
+    # Trailing NaT slot absorbs missing values (code -1)
+    table = np.array([decoded[u] if u in decoded else _DATE_MEMO[u] for u in uniques] + [np.datetime64('NaT')],
+                     dtype='datetime64[ns]')
+    dates = table[codes]
+    
+    bad = np.isnat(table[:-1])
+    if bad.any():
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        failed = int(counts[bad].sum())
+        if failed:
+            examples = ", ".join(repr(u) for u in np.asarray(uniques, dtype=object)[bad][:3])
+            print(f"Date Parse Warning: {failed:,} rows with unparseable dates (e.g. {examples})")
+    
+    return pd.Series(dates, index=values.index, name=values.name)
+
+def standardize(df):
+    """Normalizes column names and parses the date column in place."""
+    # Standardize schema: Trim whitespace and normalize to lowercase
+    df.columns = [c.strip().lower() for c in df.columns]
+    
+    # Temporal normalization: Ensure standard datetime objects
+    if 'date' in df.columns:
+        df['date'] = parse_dates(df['date'])
+    return df
+
+def shard_fingerprint(path):
+    """Identifies a shard revision by absolute path, size and modification time."""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def diff_shards(folder_name, manifest):
+    """
+    Compares a dataset folder against a manifest of already processed shards.
+    
+    The manifest maps shard file names to their size and mtime. Returns the
+    shards that are new or changed, the names of shards that disappeared and
+    the up-to-date manifest entries for the folder.
+    """
+    current = {}
+    changed = []
+    for f in list_shards(folder_name):
+        fp = shard_fingerprint(f)
+        name = os.path.basename(f)
+        current[name] = {'size': fp['size'], 'mtime_ns': fp['mtime_ns']}
+        if manifest.get(name) != current[name]:
+            changed.append(f)
+    removed = sorted(set(manifest) - set(current))
+    return changed, removed, current
+
+def _cache_entry(path):
+    """Resolves the cache directory for the current revision of a shard."""
+    key = dict(shard_fingerprint(path), version=CACHE_VERSION)
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{os.path.basename(path)}.{digest}")
+
+def write_columns(frame, directory, prefix):
+    """Saves each column of a frame as a .npy file (categoricals as codes) and returns its column spec."""
+    columns = {}
+    for col in frame.columns:
+        series = frame[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(directory, f"{prefix}.{col}.npy"), series.cat.codes.to_numpy())
+            columns[col] = {'kind': 'category', 'categories': series.cat.categories.tolist()}
+        else:
+            np.save(os.path.join(directory, f"{prefix}.{col}.npy"), series.to_numpy())
+            columns[col] = {'kind': 'array'}
+    return columns
+
+def read_columns(directory, prefix, columns):
+    """Memory-maps columns saved by write_columns back into a DataFrame."""
+    data = {}
+    for col, spec in columns.items():
+        # Copy-on-write mapping: pages load lazily and stay private to this process
+        values = np.load(os.path.join(directory, f"{prefix}.{col}.npy"), mmap_mode='c')
+        if spec['kind'] == 'category':
+            values = pd.Categorical.from_codes(values, categories=spec['categories'])
+        data[col] = values
+    return pd.DataFrame(data, copy=False)
+
+class ShardCacheWriter:
+    """Persists the compact chunks of one shard as columnar .npy parts."""
+    
+    def __init__(self, path):
+        self.entry = _cache_entry(path)
+        self.tmp_dir = f"{self.entry}.tmp-{os.getpid()}"
+        self.fingerprint = dict(shard_fingerprint(path), version=CACHE_VERSION)
+        self.parts = []
+        os.makedirs(self.tmp_dir, exist_ok=True)
+    
+    def add(self, frame):
+        columns = write_columns(frame, self.tmp_dir, f"part{len(self.parts)}")
+        self.parts.append({'rows': len(frame), 'columns': columns})
+    
+    def commit(self):
+        with open(os.path.join(self.tmp_dir, "meta.json"), "w") as f:
+            json.dump({'fingerprint': self.fingerprint, 'parts': self.parts}, f)
+        
+        # Drop cache entries left behind by earlier revisions of this shard
+        prefix = os.path.basename(self.entry).rsplit('.', 1)[0]
+        for stale in glob.glob(os.path.join(CACHE_DIR, glob.escape(prefix) + ".*")):
+            if stale != self.tmp_dir and '.tmp-' not in stale:
+                shutil.rmtree(stale, ignore_errors=True)
+        os.replace(self.tmp_dir, self.entry)
+    
+    def abort(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+def load_shard_cache(path):
+    """Memory-maps the cached parts of a shard, or returns None on a cache miss."""
+    entry = _cache_entry(path)
+    meta_path = os.path.join(entry, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return [read_columns(entry, f"part{idx}", part['columns']) for idx, part in enumerate(meta['parts'])]
+
+def widen(df):
+    """Converts a compact frame back to the plain dtypes produced by pd.read_csv."""
+    out = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            out[col] = series.astype(series.cat.categories.dtype)
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            out[col] = series.astype('int64')
+        else:
+            out[col] = series
+    return pd.DataFrame(out)
+
+def _parse_chunks(path, chunksize, strict=True):
+    """Parses a shard chunk by chunk with the (strict or loose) compact dtypes."""
+    reader = pd.read_csv(path, dtype=shard_dtypes(path, strict), chunksize=chunksize)
+    for chunk in reader:
+        yield standardize(chunk)
+
+def _loose_warning(path, error):
+    print(f"Parse Warning: {path} does not fit the integer dtypes ({error}); parsing with inferred dtypes.")
+
+def cache_shard(path, chunksize=CHUNK_SIZE):
+    """
+    Parses a whole shard into the shard cache and returns its memory-mapped parts.
+    
+    Shards with blank or non-integer counts/pincodes fail the integer dtypes
+    with a ValueError and are re-parsed with inferred numeric dtypes. The
+    entry only becomes visible once the whole shard has parsed.
+    """
+    for strict in (True, False):
+        writer = ShardCacheWriter(path)
+        try:
+            for chunk in _parse_chunks(path, chunksize, strict):
+                writer.add(chunk)
+            writer.commit()
+            return load_shard_cache(path)
+        except pd.errors.ParserError:
+            # Malformed CSV, not a dtype mismatch: looser dtypes will not help
+            writer.abort()
+            raise
+        except ValueError as e:
+            writer.abort()
+            if not strict:
+                raise
+            _loose_warning(path, e)
+        except BaseException:
+            writer.abort()
+            raise
+
+def open_shard(path, chunksize=CHUNK_SIZE, use_cache=True):
+    """
+    Prepares a shard for streaming and returns an iterator over its chunks.
+    
+    With the cache, the shard is fully parsed (or found cached) before this
+    returns, so a bad shard fails here rather than after some of its chunks
+    have been consumed. Without it, chunks are parsed as they are read and
+    a parse error part way through propagates to the caller.
+    """
+    parts = None
+    if use_cache:
+        parts = load_shard_cache(path)
+        if parts is None:
+            try:
+                parts = cache_shard(path, chunksize)
+            except OSError as e:
+                print(f"Cache Warning: Could not persist {path}. Details: {e}")
+    if parts is not None:
+        return (part.iloc[start:start + chunksize] for part in parts for start in range(0, len(part), chunksize))
+    return _parse_chunks(path, chunksize)
+
+def iter_shard(path, chunksize=CHUNK_SIZE, use_cache=True):
+    """Streams a single CSV shard as standardized, compactly typed chunks (see open_shard)."""
+    yield from open_shard(path, chunksize, use_cache)
+
+def iter_dataset(folder_name, chunksize=CHUNK_SIZE, use_cache=True):
+    """
+    Streams every shard of a dataset folder chunk by chunk.
+    
+    Peak memory is bounded by a single chunk regardless of the number of shards.
+    State and district arrive as categoricals, so downstream groupbys should
+    pass observed=True to avoid expanding the full category cross-product.
+    A shard that cannot be parsed is reported and skipped before any of its
+    chunks are yielded; errors after that point are raised, never swallowed.
+    """
+    files = list_shards(folder_name)
     if not files:
-        print(f"I/O Warning: No data files identified in {path}")
-        return pd.DataFrame()
+        print(f"I/O Warning: No data files identified in {os.path.join(BASE_DIR, folder_name)}")
+        return
     
-    dfs = []
     for f in files:
         try:
-            # Load individual CSV shards
-            df = pd.read_csv(f)
-            dfs.append(df)
+            chunks = open_shard(f, chunksize, use_cache)
         except Exception as e:
             print(f"Data Read Error: Failed to process {f}. Details: {e}")
-            
+            continue
+        yield from chunks
+
+def read_shard(path, use_cache=True):
+    """Parses a single CSV shard into a standardized DataFrame, via the shard cache when enabled."""
+    if not use_cache:
+        return standardize(pd.read_csv(path))
+    
+    parts = load_shard_cache(path)
+    if parts is None:
+        try:
+            parts = cache_shard(path)
+        except OSError as e:
+            print(f"Cache Warning: Could not persist {path}. Details: {e}")
+            try:
+                parts = [standardize(pd.read_csv(path, dtype=shard_dtypes(path)))]
+            except ValueError as e:
+                _loose_warning(path, e)
+                parts = [standardize(pd.read_csv(path, dtype=shard_dtypes(path, strict=False)))]
+    
+    frames = [widen(p) for p in parts]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+def combine_shards(folder_name, files, frames):
+    """Concatenates parsed shards, reporting any shard that failed to load."""
+    dfs = []
+    for f, df in zip(files, frames):
+        if isinstance(df, Exception):
+            print(f"Data Read Error: Failed to process {f}. Details: {df}")
+        else:
+            dfs.append(df)
+    
     if not dfs:
+        if not files:
+            print(f"I/O Warning: No data files identified in {os.path.join(BASE_DIR, folder_name, '*.csv')}")
         return pd.DataFrame()
-        
-    final_df = pd.concat(dfs, ignore_index=True)
+    return pd.concat(dfs, ignore_index=True)
+
+def _parse_serial(files, use_cache=True):
+    """Parses shards one after another, capturing failures per shard."""
+    frames = []
+    for f in files:
+        try:
+            frames.append(read_shard(f, use_cache))
+        except Exception as e:
+            frames.append(e)
+    return frames
+
+def _gather(futures):
+    """Collects shard results from a process pool, capturing failures per shard."""
+    frames = []
+    for fut in futures:
+        try:
+            frames.append(fut.result())
+        except Exception as e:
+            frames.append(e)
+    return frames
+
+def load_dataset(folder_name, chunksize=None, use_cache=True):
+    """
+    Memory-efficient loading and standardizing of CSV datasets from a specified folder.
     
-    # Standardize schema: Trim whitespace and normalize to lowercase
-    final_df.columns = [c.strip().lower() for c in final_df.columns]
+    With a chunksize, returns an iterator of compactly typed chunks instead of a
+    single DataFrame (mirroring pd.read_csv). Parsed shards are kept in a columnar
+    cache under UIDIA-Datasets/.cache and reused until the CSV changes.
+    """
+    if chunksize:
+        return iter_dataset(folder_name, chunksize, use_cache)
     
-    # Temporal normalization: Ensure standard datetime objects
-    if 'date' in final_df.columns:
-        final_df['date'] = pd.to_datetime(final_df['date'], dayfirst=True, errors='coerce')
-        
-    return final_df
+    files = list_shards(folder_name)
+    return combine_shards(folder_name, files, _parse_serial(files, use_cache))
 
-def load_all():
-    """Orchestrates ingestion across all core Aadhaar transaction datasets."""
-    print("Initializing multi-stream data ingestion...")
+def load_all(workers=1, use_cache=True):
+    """
+    Orchestrates ingestion across all core Aadhaar transaction datasets.
     
-    print("Ingesting Biometric Transaction Logs...")
-    bio = load_dataset("api_data_aadhar_biometric")
-    
-    print("Ingesting Demographic Update Logs...")
-    demo = load_dataset("api_data_aadhar_demographic")
+    With workers > 1 (or None for one per CPU), every shard of every stream is
+    parsed concurrently in a process pool; the returned frames are identical to
+    the sequential path.
+    """
+    print("Initializing multi-stream data ingestion...")
+    shards = {key: list_shards(folder) for key, folder, _ in STREAMS}
     
-    print("Ingesting Enrolment Registry Logs...")
-    enrol = load_dataset("api_data_aadhar_enrolment")
+    if workers == 1:
+        frames = {}
+        for key, folder, label in STREAMS:
+            print(f"Ingesting {label}...")
+            frames[key] = combine_shards(folder, shards[key], _parse_serial(shards[key], use_cache))
+    else:
+        print(f"Ingesting {sum(len(f) for f in shards.values())} shards across a process pool...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Submit every shard up front so streams overlap as well as shards
+            futures = {key: [pool.submit(read_shard, f, use_cache) for f in files] for key, files in shards.items()}
+            frames = {}
+            for key, folder, label in STREAMS:
+                frames[key] = combine_shards(folder, shards[key], _gather(futures[key]))
+                print(f"Ingested {label}: {len(frames[key]):,} records")
     
-    return bio, demo, enrol
+    return frames['bio'], frames['demo'], frames['enrol']
 
 if __name__ == "__main__":
     # Internal validation logic
@@ -1,8 +1,6 @@
-import pandas as pd
-import numpy as np
 import os
-from data_loader import load_all
-from anomaly_detector import detect_ghosts
+from aggregate_data import load_aggregates, AGE_COLS
+from anomaly_detector import robust_anomaly_detection
 
 # Setup paths
 BASE_DIR = os.path.abspath(os.path.join(os.getcwd()))
@@ -14,31 +12,20 @@ def deep_dive():
     if not os.path.exists(RESULTS_DIR):
         os.makedirs(RESULTS_DIR)
 
-    # 1. Load All Datasets
-    bio, demo, enrol = load_all()
-    if enrol.empty or demo.empty:
+    # 1. Load Fused Aggregates (one chunked pass over the raw shards, shared with aggregate_data)
+    aggregates = load_aggregates()
+    profile = aggregates['district']
+    if not any(c.startswith('enrol_') for c in profile.columns) or not any(c.startswith('demo_') for c in profile.columns):
         print("Data Loading Error: Datasets are empty. Verify data source paths.")
         return
 
-    print(f"Data ingestion complete. Enrolment: {len(enrol)}, Demographic: {len(demo)}, Biometric: {len(bio)}")
+    print(f"Aggregate ingestion complete. Districts: {len(profile)}, Months: {len(aggregates['age'])}")
 
-    # 2. Generate District Profile (Aggregation)
-    def group_df(df, prefix):
-        numeric = df.select_dtypes(include=[np.number]).columns
-        cols = [c for c in numeric if c != 'pincode']
-        return df.groupby(['state', 'district'])[cols].sum().add_prefix(prefix)
-
-    b_grp = group_df(bio, "bio_")
-    d_grp = group_df(demo, "demo_")
-    e_grp = group_df(enrol, "enrol_")
-    
-    profile = e_grp.join(d_grp, how='outer').join(b_grp, how='outer').fillna(0).reset_index()
-    profile_path = os.path.join(RESULTS_DIR, "district_profile.csv")
-    profile.to_csv(profile_path, index=False)
-    print(f"Regional profile preserved at {profile_path}")
+    # 2. District Profile (persisted by the fused aggregation stage)
+    print(f"Regional profile preserved at {os.path.join(RESULTS_DIR, 'district_profile.csv')}")
 
     # 3. Detect Ghost Districts and Scored Profile
-    ghosts, processed_df = detect_ghosts(profile)
+    processed_df, ghosts = robust_anomaly_detection(profile)
     
     # 4. State Performance Ranking
     state_stats = processed_df.groupby('state').agg({
@@ -58,11 +45,9 @@ def deep_dive():
     print("\nBOTTOM 5 STATES (BY GHOST COUNT):")
     print(state_stats.sort_values('ghost_count', ascending=False).head(5)[['state', 'update_rate', 'ghost_count']])
 
-    # 5. Age Group Spikes (from raw enrolment)
-    enrol['month'] = enrol['date'].dt.month
-    enrol['month_name'] = enrol['date'].dt.month_name()
-    age_cols = ['age_0_5', 'age_5_17', 'age_18_greater']
-    age_monthly = enrol.groupby(['month', 'month_name'])[age_cols].sum().reset_index()
+    # 5. Age Group Spikes (from the fused monthly cohort table)
+    age_cols = AGE_COLS
+    age_monthly = aggregates['age']
     
     print("\nAGE GROUP MONTHLY PEAKS:")
     for col in age_cols:
@@ -72,19 +57,18 @@ def deep_dive():
         print(f"Group {col}: Peak Month {peak_m}, Volume {peak_v:,.0f}")
 
     # 6. Statistical Anomaly Flagging (|Z| > 2.0)
-    high_outliers = processed_df[processed_df['update_zscore'] > 2.0].sort_values('update_zscore', ascending=False)
-    low_outliers = processed_df[processed_df['update_zscore'] < -2.0].sort_values('update_zscore', ascending=True)
+    high_outliers = processed_df[processed_df['robust_z'] > 2.0].sort_values('robust_z', ascending=False)
+    low_outliers = processed_df[processed_df['robust_z'] < -2.0].sort_values('robust_z', ascending=True)
     
     print("\nHIGH INTENSITY ANOMALIES (|Z| > 2.0):")
-    print(high_outliers.head(5)[['district', 'state', 'update_zscore', 'update_intensity']])
+    print(high_outliers.head(5)[['district', 'state', 'robust_z', 'update_intensity']])
     
     print("\nLOW INTENSITY ANOMALIES (|Z| < -2.0):")
-    print(low_outliers.head(5)[['district', 'state', 'update_zscore', 'update_intensity']])
+    print(low_outliers.head(5)[['district', 'state', 'robust_z', 'update_intensity']])
 
     # Persist results for report generation
     state_stats.to_csv(os.path.join(RESULTS_DIR, 'state_results.csv'), index=False)
     processed_df.to_csv(os.path.join(RESULTS_DIR, 'district_anomalies.csv'), index=False)
-    age_monthly.to_csv(os.path.join(RESULTS_DIR, 'age_trends.csv'), index=False)
     print("\nAnalysis results stored in: analysis/results/")
 
 if __name__ == "__main__":
@@ -2,52 +2,140 @@ import pandas as pd
 import numpy as np
 import os
 import matplotlib.pyplot as plt
+from aggregate_cube import RESULTS_DIR, load_cube, stream_totals
 
 # Configuration for export directory
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 IMAGE_DIR = os.path.join(BASE_DIR, "final_submission", "images")
 
+MEASURE = 'enrol_total'  # Stream total being projected
+HORIZON = 6  # Months projected past the last observed month
+TREND_DEGREE = 1  # Polynomial order of the trend (1 = OLS line)
+INTERVAL_Z = 2.0  # Half-width of the predictive interval in standard errors
+
+def month_offsets(months, origin):
+    """Whole calendar months between each month and the origin."""
+    months = pd.DatetimeIndex(months)
+    return np.asarray((months.year - origin.year) * 12 + (months.month - origin.month), dtype='float64')
+
+def monthly_matrix(totals, keys, measure=MEASURE):
+    """
+    Pivots long monthly totals into a series x month matrix.
+
+    Only months in which the measure was reported at all are kept (a stream
+    with no national volume in a month is missing data, not a zero); within
+    those, absent series-months count as zero. Returns (matrix, series index,
+    months).
+    """
+    national = totals.groupby('month')[measure].sum()
+    months = pd.DatetimeIndex(sorted(national.index[national > 0]))
+    frame = totals[totals['month'].isin(months)]
+    matrix = frame.pivot_table(index=keys, columns='month', values=measure, aggfunc='sum',
+                               fill_value=0, observed=True).reindex(columns=months, fill_value=0)
+    return matrix.to_numpy(dtype='float64'), matrix.index, months
+
+def fit_trends(series, t, future_t, degree=TREND_DEGREE, z=INTERVAL_Z):
+    """
+    Fits a polynomial trend to every row of a series x month matrix at once.
+
+    All series share one design matrix, so a single least-squares solve over
+    the stacked right-hand sides replaces a per-series np.polyfit loop.
+    Intervals use each series' residual standard error and the shared
+    leverage of every future month. Returns (coefficients, highest order
+    first like np.polyfit; residual standard errors; forecast, lower and
+    upper arrays of shape series x horizon).
+    """
+    design = np.vander(t, degree + 1)
+    coef, _, rank, _ = np.linalg.lstsq(design, series.T, rcond=None)
+    residuals = series - (design @ coef).T
+    dof = len(t) - rank
+    rse = np.sqrt((residuals ** 2).sum(axis=1) / dof) if dof > 0 else np.full(len(series), np.nan)
+
+    future = np.vander(future_t, degree + 1)
+    forecast = (future @ coef).T
+    leverage = np.einsum('ij,jk,ik->i', future, np.linalg.pinv(design.T @ design), future)
+    half_width = z * rse[:, None] * np.sqrt(1 + leverage)[None, :]
+    return coef.T, rse, forecast, forecast - half_width, forecast + half_width
+
+def batch_forecast(totals, keys, measure=MEASURE, horizon=HORIZON, degree=TREND_DEGREE):
+    """
+    Projects every series of a monthly rollup (all districts, all states) in one vectorised call.
+
+    totals: long frame with the key columns, 'month' and the measure.
+    Returns (fits, forecasts): one row per series with its trend coefficients
+    and residual standard error, and one row per series and future month
+    with the point forecast and its interval.
+    """
+    series, index, months = monthly_matrix(totals, keys, measure)
+    if len(months) < degree + 1:
+        raise ValueError(f"{len(months)} reported month(s) cannot fit a degree-{degree} trend.")
+    future_months = pd.date_range(months[-1] + pd.offsets.MonthBegin(1), periods=horizon, freq='MS')
+    coef, rse, forecast, lower, upper = fit_trends(series, month_offsets(months, months[0]),
+                                                   month_offsets(future_months, months[0]), degree)
+
+    fits = index.to_frame(index=False)
+    fits['months'] = len(months)
+    fits['last_actual'] = series[:, -1]
+    for power, values in zip(range(degree, -1, -1), coef.T):
+        fits[f'coef_t{power}'] = values
+    fits['rse'] = rse
+
+    forecasts = fits[list(keys)].loc[np.repeat(np.arange(len(fits)), horizon)].reset_index(drop=True)
+    forecasts['month'] = np.tile(future_months, len(fits))
+    # Volumes cannot go negative
+    forecasts['forecast'] = np.clip(forecast, 0, None).ravel()
+    forecasts['lower'] = np.clip(lower, 0, None).ravel()
+    forecasts['upper'] = np.clip(upper, 0, None).ravel()
+    return fits, forecasts
+
 def run_forecast():
     """Executes a predictive trend analysis for Aadhaar enrolment throughput."""
-    # Ingest monthly stats from the temporal analysis module
-    from analyze_monthly_trends import analyze_monthly_enrollment
-    monthly_stats = analyze_monthly_enrollment()
-    
-    if monthly_stats is None:
-        print("Error: Predictive model dependency (temporal analysis) returned null.")
+    # Monthly rollups of the aggregate cube feed every level of the forecast
+    try:
+        cube = load_cube()
+    except Exception as e:
+        print(f"Error: Predictive model dependency (aggregate cube) unavailable: {e}")
+        return
+
+    district_totals = stream_totals(cube, 'district_month')
+    if MEASURE not in district_totals.columns:
+        print("Error: Predictive model dependency (enrolment stream) returned null.")
+        return
+
+    try:
+        for name, totals, keys in [('district', district_totals, ['state', 'district']),
+                                   ('state', stream_totals(cube, 'state_month'), ['state'])]:
+            fits, forecasts = batch_forecast(totals, keys)
+            output_path = os.path.join(RESULTS_DIR, f"{name}_forecasts.csv")
+            forecasts.merge(fits, on=keys).to_csv(output_path, index=False)
+            print(f"{len(fits)} {name} trend forecasts persisted to {output_path}")
+
+        # National series: the same engine over a single stacked row
+        national = district_totals.assign(scope='India')
+        data, _, months = monthly_matrix(national, ['scope'])
+        _, forecasts = batch_forecast(national, ['scope'])
+        forecast_mean = forecasts['forecast'].to_numpy()
+    except ValueError as e:
+        print(f"Error: Predictive model could not be fitted: {e}")
         return
 
-    # Temporal sequencing for time-series modeling
-    data = monthly_stats['total_enrol'].values
-    x = np.arange(len(data))
-    
-    # Linear Regression (Ordinary Least Squares) for trend estimation
-    z = np.polyfit(x, data, 1)
-    p = np.poly1d(z)
-    
-    # Projection window: Next 6 fiscal periods
-    future_x = np.arange(12, 18)
-    forecast_mean = p(future_x)
-    
-    # Statistical uncertainty estimation (Residual Standard Error)
-    residuals = data - p(x)
-    std_error = np.std(residuals)
-    
     # Projection Visualization
     plt.figure(figsize=(10, 6))
-    plt.plot(monthly_stats['month_name'], data, label='Historical Observation (2024-25)', marker='o', color='#2C3E50', linewidth=2)
-    
-    future_months = ['Jan-26', 'Feb-26', 'Mar-26', 'Apr-26', 'May-26', 'Jun-26']
-    plt.plot(future_months, forecast_mean, label='Predictive Trend (2026)', linestyle='--', marker='s', color='#E74C3C')
-    plt.fill_between(future_months, forecast_mean - 2*std_error, forecast_mean + 2*std_error, color='#E74C3C', alpha=0.15, label='95% Predictive Interval')
-    
+    history_months = months.strftime('%b-%y')
+    plt.plot(history_months, data[0], label=f'Historical Observation ({history_months[0]} to {history_months[-1]})',
+             marker='o', color='#2C3E50', linewidth=2)
+
+    future_months = pd.DatetimeIndex(forecasts['month']).strftime('%b-%y')
+    plt.plot(future_months, forecast_mean, label=f'Predictive Trend (next {HORIZON} months)', linestyle='--', marker='s', color='#E74C3C')
+    plt.fill_between(future_months, forecasts['lower'], forecasts['upper'], color='#E74C3C', alpha=0.15, label='95% Predictive Interval')
+
     plt.title('Aadhaar Enrolment Forecasting (90-Day Predictive Model)', fontsize=14, fontweight='bold')
     plt.ylabel('Transactional Throughput')
     plt.xlabel('Fiscal Month')
     plt.xticks(rotation=45)
     plt.legend()
     plt.grid(True, linestyle='--', alpha=0.7)
-    
+
     output_path = os.path.join(IMAGE_DIR, 'enrollment_forecast.png')
     plt.savefig(output_path, dpi=300, bbox_inches='tight')
     plt.close()
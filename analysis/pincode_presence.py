@@ -0,0 +1,118 @@
+import pandas as pd
+import numpy as np
+import os
+from aggregate_cube import load_cube, RESULTS_DIR
+from aggregate_data import STREAM_PREFIXES
+
+# Pincodes are 6-digit, so (district, month, pincode) packs into one int64 key
+PINCODE_SPAN = 1_000_000
+UPDATE_STREAMS = ('demo', 'bio')
+
+class PresenceIndex:
+    """
+    Pincode presence per stream, district and month as sorted int64 key arrays.
+
+    Every stream gets the sorted, de-duplicated keys
+    (district_code * n_months + month_code) * PINCODE_SPAN + pincode of the
+    cells where it recorded activity. District and month codes are shared
+    across streams, so cross-stream questions reduce to vectorized set
+    operations (np.setdiff1d / np.isin) over whole arrays.
+    """
+
+    def __init__(self, keys, districts, months):
+        self.keys = keys
+        self.districts = districts
+        self.months = months
+
+    @classmethod
+    def from_cube(cls, cube):
+        table = cube.tables['pincode_day']
+        district_codes, districts = pd.factorize(pd.MultiIndex.from_frame(
+            table[['state', 'district']].astype(str)))
+        month_codes, months = pd.factorize(
+            np.asarray(table['date']).astype('datetime64[M]'), sort=True)
+        keys_all = ((district_codes.astype(np.int64) * len(months) + month_codes) * PINCODE_SPAN
+                    + table['pincode'].to_numpy(dtype=np.int64))
+
+        keys = {}
+        for key, prefix in STREAM_PREFIXES:
+            cols = [c for c in cube.measures if c.startswith(prefix)]
+            if cols:
+                active = table[cols].to_numpy().sum(axis=1) > 0
+                keys[key] = np.unique(keys_all[active])
+        return cls(keys, districts, pd.DatetimeIndex(months))
+
+    def level(self, stream, by_month=True):
+        """Keys of a stream, optionally collapsed over months (month code 0)."""
+        keys = self.keys.get(stream, np.zeros(0, dtype=np.int64))
+        if by_month:
+            return keys
+        district, pincode = self.decode(keys)[::2]
+        return np.unique(district * len(self.months) * PINCODE_SPAN + pincode)
+
+    def pincodes(self, stream):
+        """Every pincode a stream has seen, under any district or month."""
+        return np.unique(self.keys.get(stream, np.zeros(0, dtype=np.int64)) % PINCODE_SPAN)
+
+    def decode(self, keys):
+        """Splits keys into (district code, month code, pincode) arrays."""
+        cell, pincode = np.divmod(keys, PINCODE_SPAN)
+        district, month = np.divmod(cell, len(self.months))
+        return district, month, pincode
+
+def orphaned_pincodes(index, source='enrol', targets=UPDATE_STREAMS, by_month=False):
+    """
+    Pincodes active in the source stream but never seen by the target streams.
+
+    Works at (district, pincode) grain across all months, or per month with
+    by_month. Each orphan is labelled 'renamed' when the update streams do
+    know the pincode, but under another district label (a nomenclature
+    break), and 'silent' otherwise (never seen, or only seen in its own
+    district in other months).
+    """
+    seen = np.zeros(0, dtype=np.int64)
+    for stream in targets:
+        seen = np.union1d(seen, index.level(stream, by_month))
+    orphans = np.setdiff1d(index.level(source, by_month), seen, assume_unique=True)
+
+    district, month, pincode = index.decode(orphans)
+    # 'renamed' needs the pincode under a district other than the orphan's own, in any month
+    seen_pairs = np.zeros(0, dtype=np.int64)
+    for stream in targets:
+        seen_pairs = np.union1d(seen_pairs, index.level(stream, by_month=False))
+    seen_pins, districts_per_pin = np.unique(seen_pairs % PINCODE_SPAN, return_counts=True)
+    slot = np.minimum(np.searchsorted(seen_pins, pincode), max(len(seen_pins) - 1, 0))
+    with_pin = np.where(seen_pins[slot] == pincode, districts_per_pin[slot], 0) if len(seen_pins) else 0
+    in_own = np.isin(district * len(index.months) * PINCODE_SPAN + pincode, seen_pairs)
+    known_elsewhere = (with_pin - in_own) > 0
+    result = pd.DataFrame({
+        'state': index.districts.get_level_values(0)[district],
+        'district': index.districts.get_level_values(1)[district],
+        'pincode': pincode,
+        'status': np.where(known_elsewhere, 'renamed', 'silent'),
+    })
+    if by_month:
+        result.insert(2, 'month', index.months[month])
+    return result
+
+def main():
+    print("Building Pincode Presence Indexes...")
+    try:
+        index = PresenceIndex.from_cube(load_cube())
+        for stream, keys in index.keys.items():
+            print(f"    - {stream}: {len(np.unique(keys % PINCODE_SPAN)):,} pincodes, {len(keys):,} district-month-pincode cells")
+
+        orphans = orphaned_pincodes(index)
+        monthly = orphaned_pincodes(index, by_month=True)
+        print(f"Orphaned pincodes (enrolled, never updated in-district): {len(orphans):,}")
+        print(orphans['status'].value_counts().to_string())
+        print(f"Orphaned district-month-pincode cells: {len(monthly):,}")
+
+        orphans.to_csv(os.path.join(RESULTS_DIR, "orphaned_pincodes.csv"), index=False)
+        monthly.to_csv(os.path.join(RESULTS_DIR, "orphaned_pincodes_monthly.csv"), index=False)
+        print(f"Orphan tables exported to {RESULTS_DIR}")
+    except Exception as e:
+        print(f"Presence Index Error: {e}")
+
+if __name__ == "__main__":
+    main()
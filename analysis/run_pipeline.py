@@ -0,0 +1,239 @@
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from data_loader import STREAMS
+
+# Configuration for directory structure
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STATE_FILE = os.path.join(BASE_DIR, "analysis", "results", "pipeline_state.json")
+LOG_DIR = os.path.join(BASE_DIR, "analysis", "results", "pipeline_logs")
+
+# Only the three raw streams; heal_csv writes its output under UIDIA-Datasets/healed
+DATASETS = [f"UIDIA-Datasets/{folder}/*.csv" for _, folder, _ in STREAMS]
+RESULTS = "analysis/results"
+IMAGES = "final_submission/images"
+
+class Stage:
+    """A pipeline step: one analysis script plus the files it reads and writes (repo-relative)."""
+
+    def __init__(self, name, script, inputs, outputs, after=()):
+        self.name = name
+        self.script = script
+        # The stage's own source counts as an input, so code edits trigger a rebuild
+        self.inputs = [script] + list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+
+STAGES = [
+    Stage('aggregate', "analysis/aggregate_data.py",
+          inputs=[*DATASETS, "analysis/data_loader.py", "analysis/streaming_stats.py"],
+          outputs=[f"{RESULTS}/daily_trends.csv", f"{RESULTS}/district_profile.csv",
+                   f"{RESULTS}/monthly_profile.csv", f"{RESULTS}/age_trends.csv",
+                   f"{RESULTS}/state_profile.csv", f"{RESULTS}/correlations.csv"]),
+    Stage('cube', "analysis/aggregate_cube.py",
+          inputs=[*DATASETS, "analysis/data_loader.py", "analysis/aggregate_data.py", "analysis/streaming_stats.py"],
+          outputs=[f"{RESULTS}/cube/meta.json", f"{RESULTS}/district_correlations.csv"]),
+    Stage('pincodes', "analysis/pincode_presence.py",
+          inputs=[f"{RESULTS}/cube/meta.json", "analysis/aggregate_cube.py"],
+          outputs=[f"{RESULTS}/orphaned_pincodes.csv", f"{RESULTS}/orphaned_pincodes_monthly.csv"]),
+    Stage('anomalies', "analysis/anomaly_detector.py",
+          inputs=[f"{RESULTS}/district_profile.csv"],
+          outputs=[f"{RESULTS}/ghost_districts_detected.csv", f"{RESULTS}/full_audit_results.csv",
+                   f"{RESULTS}/audit_validation_log.txt"]),
+    Stage('states', "analysis/state_analysis.py",
+          inputs=[f"{RESULTS}/district_profile.csv"],
+          outputs=[f"{RESULTS}/state_results.csv", f"{IMAGES}/state_performance_matrix.png"]),
+    Stage('visuals', "analysis/generate_visuals.py",
+          inputs=[f"{RESULTS}/daily_trends.csv", f"{RESULTS}/district_profile.csv"],
+          outputs=[f"{IMAGES}/system_pulse_v2.png", f"{IMAGES}/naming_trap_v2.png",
+                   f"{IMAGES}/adult_tsunami_v2.png"]),
+    Stage('monthly', "analysis/analyze_monthly_trends.py",
+          inputs=[f"{RESULTS}/monthly_profile.csv", f"{RESULTS}/daily_trends.csv", "analysis/aggregate_data.py"],
+          outputs=["analysis/monthly_enrollment_analysis.txt", f"{IMAGES}/monthly_enrollment_trends_v2.png"]),
+    Stage('forecast', "analysis/forecasting.py",
+          inputs=[f"{RESULTS}/cube/meta.json", "analysis/aggregate_cube.py"],
+          outputs=[f"{IMAGES}/enrollment_forecast.png", f"{RESULTS}/district_forecasts.csv",
+                   f"{RESULTS}/state_forecasts.csv"]),
+    Stage('conclusion', "analysis/generate_conclusion_chart.py",
+          inputs=[], outputs=[f"{IMAGES}/conclusion_roi_breakdown.png"]),
+    Stage('report', "analysis/build_pro_report.py",
+          inputs=[f"{IMAGES}/TEAM-EKLAVYA-logo.png", f"{IMAGES}/naming_trap_v2.png",
+                  f"{IMAGES}/monthly_enrolment_trends_v2.png", f"{IMAGES}/adult_tsunami_v2.png",
+                  f"{IMAGES}/enrolment_forecast.png", f"{IMAGES}/state_performance_matrix.png",
+                  f"{IMAGES}/dashboard_live_terminal.png"],
+          outputs=["final_submission/Team_Eklavya_Submission_FINAL.docx"]),
+]
+
+def load_state():
+    """Reads recorded stage digests and the file-hash memo."""
+    if not os.path.exists(STATE_FILE):
+        return {'stages': {}, 'files': {}}
+    with open(STATE_FILE) as f:
+        return json.load(f)
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+def file_digest(rel_path, memo):
+    """Content hash of a file, memoized on size and mtime so unchanged shards are not re-read."""
+    path = os.path.join(BASE_DIR, rel_path)
+    stat = os.stat(path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    cached = memo.get(rel_path)
+    if cached and cached['signature'] == signature:
+        return cached['sha256']
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    memo[rel_path] = {'signature': signature, 'sha256': sha.hexdigest()}
+    return memo[rel_path]['sha256']
+
+def expand(patterns):
+    """Resolves repo-relative paths and glob patterns to the files that exist right now."""
+    files = set()
+    for pattern in patterns:
+        matches = glob.glob(os.path.join(BASE_DIR, pattern))
+        files.update(os.path.relpath(m, BASE_DIR).replace(os.sep, '/') for m in matches)
+    return sorted(files)
+
+def stage_digest(stage, memo):
+    """Hashes a stage's script and every input file it currently sees."""
+    sha = hashlib.sha256(stage.script.encode())
+    for rel_path in expand(stage.inputs):
+        sha.update(f"{rel_path}:{file_digest(rel_path, memo)}".encode())
+    return sha.hexdigest()
+
+def dependencies(stages):
+    """Derives upstream stages from output -> input file matches plus explicit ordering."""
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            producers[output] = stage.name
+
+    deps = {}
+    for stage in stages:
+        upstream = set(stage.after)
+        for pattern in stage.inputs:
+            for output, producer in producers.items():
+                if fnmatch.fnmatch(output, pattern) and producer != stage.name:
+                    upstream.add(producer)
+        deps[stage.name] = upstream
+    return deps
+
+def run_stage(stage):
+    """Executes a stage's script from the repository root, capturing its console log."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    start = time.perf_counter()
+    with open(os.path.join(LOG_DIR, f"{stage.name}.log"), "w", encoding='utf-8') as log:
+        proc = subprocess.run([sys.executable, stage.script], cwd=BASE_DIR,
+                              stdout=log, stderr=subprocess.STDOUT)
+    # Scripts report most failures on stdout, so missing outputs also count as failure
+    missing = [o for o in stage.outputs if not os.path.exists(os.path.join(BASE_DIR, o))]
+    return proc.returncode == 0 and not missing, time.perf_counter() - start
+
+def select(stages, deps, targets):
+    """Restricts the plan to the target stages and everything upstream of them."""
+    if not targets:
+        return stages
+    unknown = set(targets) - {s.name for s in stages}
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    keep, pending = set(), list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in keep:
+            keep.add(name)
+            pending.extend(deps[name])
+    return [s for s in stages if s.name in keep]
+
+def run_pipeline(targets=(), workers=os.cpu_count(), force=False):
+    """
+    Runs the analysis DAG, skipping stages whose inputs are unchanged since their last success.
+
+    A stage becomes ready once all upstream stages have finished; ready stages
+    run concurrently. Its input digest is computed only then, so a stage whose
+    upstream rebuilt identical files is still skipped.
+    """
+    deps = dependencies(STAGES)
+    stages = {s.name: s for s in select(STAGES, deps, targets)}
+    state = load_state()
+    status, digests = {}, {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while len(status) < len(stages):
+            for name, stage in stages.items():
+                if name in status or name in running.values():
+                    continue
+                upstream = deps[name] & set(stages)
+                if any(status.get(u) == 'failed' or status.get(u) == 'blocked' for u in upstream):
+                    status[name] = 'blocked'
+                    print(f"[BLOCKED] {name}: upstream failure")
+                    continue
+                if not upstream <= set(status):
+                    continue
+
+                digest = stage_digest(stage, state['files'])
+                outputs_present = all(os.path.exists(os.path.join(BASE_DIR, o)) for o in stage.outputs)
+                if not force and outputs_present and state['stages'].get(name) == digest:
+                    status[name] = 'skipped'
+                    print(f"[SKIP] {name}: inputs unchanged")
+                    continue
+
+                print(f"[RUN] {name}...")
+                running[pool.submit(run_stage, stage)] = name
+                digests[name] = digest
+
+            if not running:
+                if len(status) < len(stages):
+                    raise ValueError("Stage graph contains a cycle.")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                ok, elapsed = future.result()
+                if ok:
+                    status[name] = 'ran'
+                    state['stages'][name] = digests[name]
+                    print(f"[DONE] {name} ({elapsed:.1f}s)")
+                else:
+                    status[name] = 'failed'
+                    state['stages'].pop(name, None)
+                    print(f"[FAILED] {name}: see {os.path.join(LOG_DIR, name + '.log')}")
+            save_state(state)
+
+    save_state(state)
+    return status
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the audit analysis pipeline, rebuilding only what changed.")
+    parser.add_argument('stages', nargs='*', help="Target stages (default: all)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Stages to run in parallel")
+    parser.add_argument('--force', action='store_true', help="Ignore recorded digests and rebuild")
+    parser.add_argument('--list', action='store_true', help="Print the stage graph and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        deps = dependencies(STAGES)
+        for stage in STAGES:
+            print(f"{stage.name:<12} <- {', '.join(sorted(deps[stage.name])) or '-'}")
+        return
+
+    status = run_pipeline(args.stages, args.workers, args.force)
+    summary = {k: sum(1 for v in status.values() if v == k) for k in ('ran', 'skipped', 'failed', 'blocked')}
+    print("Pipeline summary: " + ", ".join(f"{v} {k}" for k, v in summary.items()))
+    sys.exit(1 if summary['failed'] else 0)
+
+if __name__ == "__main__":
+    main()
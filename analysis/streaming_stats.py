@@ -0,0 +1,282 @@
+import pandas as pd
+import numpy as np
+import json
+
+class CoMoments:
+    """
+    Mergeable streaming accumulators for Pearson correlation (count, means, co-moments).
+
+    Observations can be added in any number of batches, retracted again and
+    merged with accumulators built on other shards, workers or runs using the
+    pairwise update of Chan et al., so correlations never need a re-scan.
+    With group columns, one accumulator is kept per group and every batch
+    is folded into all groups in a single vectorized pass.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.labels = []
+        self._positions = {}
+        k = len(self.columns)
+        self.n = np.zeros(0)
+        self.mean = np.zeros((0, k))
+        self.comoment = np.zeros((0, k, k))
+
+    def _locate(self, labels):
+        """Maps group labels to accumulator rows, allocating rows for unseen groups."""
+        for label in labels:
+            if label not in self._positions:
+                self._positions[label] = len(self.labels)
+                self.labels.append(label)
+        grow = len(self.labels) - len(self.n)
+        if grow:
+            k = len(self.columns)
+            self.n = np.concatenate([self.n, np.zeros(grow)])
+            self.mean = np.concatenate([self.mean, np.zeros((grow, k))])
+            self.comoment = np.concatenate([self.comoment, np.zeros((grow, k, k))])
+        return np.array([self._positions[label] for label in labels], dtype=np.intp)
+
+    def _combine(self, rows, n, mean, comoment, sign):
+        """Folds batch moments into the given rows; sign=-1 retracts them instead."""
+        na, nb = self.n[rows], sign * n
+        total = na + nb
+        delta = mean - self.mean[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(total > 0, nb / total, 0.0)
+            weight = np.where(total > 0, na * nb / total, 0.0)
+        self.mean[rows] = np.where(total[:, None] > 0, self.mean[rows] + delta * share[:, None], 0.0)
+        self.comoment[rows] += sign * comoment + weight[:, None, None] * delta[:, :, None] * delta[:, None, :]
+        self.n[rows] = total
+
+    def _apply(self, frame, by, sign):
+        if frame.empty:
+            return self
+        X = frame[self.columns].to_numpy(dtype='float64')
+        if by:
+            codes, uniques = pd.factorize(pd.MultiIndex.from_frame(frame[list(by)]) if len(by) > 1 else frame[by[0]])
+            labels = list(uniques)
+        else:
+            codes, labels = np.zeros(len(frame), dtype=np.intp), [None]
+
+        # Per-group batch moments via weighted bincounts (no Python loop over groups)
+        G, k = len(labels), len(self.columns)
+        n = np.bincount(codes, minlength=G).astype('float64')
+        sums = np.stack([np.bincount(codes, weights=X[:, i], minlength=G) for i in range(k)], axis=1)
+        mean = sums / np.maximum(n, 1)[:, None]
+        centered = X - mean[codes]
+        comoment = np.empty((G, k, k))
+        for i in range(k):
+            for j in range(i, k):
+                comoment[:, i, j] = comoment[:, j, i] = np.bincount(
+                    codes, weights=centered[:, i] * centered[:, j], minlength=G)
+
+        self._combine(self._locate(labels), n, mean, comoment, sign)
+        return self
+
+    def update(self, frame, by=None):
+        """Adds the rows of a frame as observations (per group when by is given)."""
+        return self._apply(frame, by, 1.0)
+
+    def remove(self, frame, by=None):
+        """Retracts rows previously added with update, e.g. days revised by a late shard."""
+        return self._apply(frame, by, -1.0)
+
+    def merge(self, other):
+        """Folds another accumulator over the same columns into this one."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge co-moment accumulators over different columns.")
+        if other.labels:
+            self._combine(self._locate(other.labels), other.n, other.mean, other.comoment, 1.0)
+        return self
+
+    def corr(self, label=None):
+        """Pearson correlation matrix of one group (the ungrouped accumulator by default)."""
+        C = self.comoment[self._positions[label]]
+        scale = np.sqrt(np.diag(C))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = C / np.outer(scale, scale)
+        return pd.DataFrame(r, index=self.columns, columns=self.columns)
+
+    def pair_corr(self, a, b):
+        """Pearson correlation between two columns for every group at once."""
+        i, j = self.columns.index(a), self.columns.index(b)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = self.comoment[:, i, j] / np.sqrt(self.comoment[:, i, i] * self.comoment[:, j, j])
+        return pd.Series(r, index=pd.Index(self.labels, tupleize_cols=True), name=f"{a}~{b}")
+
+    def save(self, path):
+        """Persists the accumulator state so later runs can keep folding into it."""
+        labels = [list(l) if isinstance(l, tuple) else l for l in self.labels]
+        np.savez(path, n=self.n, mean=self.mean, comoment=self.comoment,
+                 meta=np.array(json.dumps({'columns': self.columns, 'labels': labels})))
+
+    @classmethod
+    def load(cls, path):
+        """Restores an accumulator written by save."""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            acc = cls(meta['columns'])
+            acc._locate([tuple(l) if isinstance(l, list) else l for l in meta['labels']])
+            acc.n, acc.mean, acc.comoment = data['n'], data['mean'], data['comoment']
+        return acc
+
+class QuantileSketch:
+    """
+    Mergeable relative-error quantile sketch for non-negative values (DDSketch-style).
+
+    Values are counted in logarithmic buckets, so every quantile is returned
+    within relative_accuracy of an exact value. Unlike KLL or t-digest the
+    bucket counts can also be decremented, which lets a value be retracted
+    when the quantity it summarises is revised by newly arrived data.
+    Sketches with the same accuracy merge by adding their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.offset = 0
+        self.counts = np.zeros(0)
+        self.zeros = 0.0
+
+    @property
+    def count(self):
+        return self.zeros + self.counts.sum()
+
+    def _grow(self, lo, hi):
+        """Widens the dense bucket array to cover bucket indices lo..hi."""
+        if not len(self.counts):
+            self.offset, self.counts = lo, np.zeros(hi - lo + 1)
+            return
+        start, stop = min(lo, self.offset), max(hi, self.offset + len(self.counts) - 1)
+        if start == self.offset and stop == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(stop - start + 1)
+        counts[self.offset - start:self.offset - start + len(self.counts)] = self.counts
+        self.offset, self.counts = start, counts
+
+    def _apply(self, values, sign):
+        values = np.asarray(values, dtype='float64').ravel()
+        values = values[~np.isnan(values)]
+        if (values < 0).any():
+            raise ValueError("QuantileSketch only accepts non-negative values.")
+        positive = values[values > 0]
+        self.zeros += sign * (len(values) - len(positive))
+        if len(positive):
+            index = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+            self._grow(index.min(), index.max())
+            self.counts += sign * np.bincount(index - self.offset, minlength=len(self.counts))
+        return self
+
+    def update(self, values):
+        """Adds a batch of observations."""
+        return self._apply(values, 1.0)
+
+    def remove(self, values):
+        """Retracts observations previously added with update."""
+        return self._apply(values, -1.0)
+
+    def merge(self, other):
+        """Folds another sketch with the same accuracy into this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches with different accuracy.")
+        if len(other.counts):
+            self._grow(other.offset, other.offset + len(other.counts) - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+        self.zeros += other.zeros
+        return self
+
+    def quantiles(self, qs):
+        """Approximate quantiles (0..1) of everything currently in the sketch."""
+        qs = np.atleast_1d(np.asarray(qs, dtype='float64'))
+        n = self.count
+        if n <= 0:
+            return np.full(len(qs), np.nan)
+        if not len(self.counts):
+            return np.zeros(len(qs))
+        ranks = qs * (n - 1)
+        cumulative = np.cumsum(self.counts)
+        bucket = np.searchsorted(cumulative, ranks - self.zeros, side='right')
+        bucket = np.minimum(bucket, len(self.counts) - 1)
+        # Bucket i covers (gamma^(i-1), gamma^i]; its midpoint bounds the relative error
+        values = 2 * self.gamma ** (bucket + self.offset) / (self.gamma + 1)
+        return np.where(ranks < self.zeros, 0.0, values)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def save(self, path):
+        """Persists the bucket counts so later runs can keep folding into them."""
+        np.savez(path, counts=self.counts, meta=np.array(json.dumps({
+            'relative_accuracy': self.relative_accuracy, 'offset': int(self.offset), 'zeros': self.zeros})))
+
+    @classmethod
+    def load(cls, path):
+        """Restores a sketch written by save."""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            sketch = cls(meta['relative_accuracy'])
+            sketch.offset, sketch.zeros, sketch.counts = meta['offset'], meta['zeros'], data['counts']
+        return sketch
+
+class SpaceSaving:
+    """
+    Bounded-memory heavy-hitter summary over int64 keys (weighted Space-Saving).
+
+    At most `capacity` counters are kept. Batches are pre-aggregated and
+    folded in with the mergeable-summary rule: a key missing from one side
+    is charged that side's smallest counter, which is also recorded as its
+    error. Every count overestimates the true total by at most its error
+    (itself at most total / capacity), so any key heavier than that is
+    guaranteed to be retained.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0)
+        self.errors = np.zeros(0)
+        self.total = 0.0
+
+    def _floor(self):
+        return self.counts.min() if len(self.counts) >= self.capacity else 0.0
+
+    def _combine(self, keys, counts, errors, floor):
+        own_floor, n_own = self._floor(), len(self.keys)
+        uniques, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        G = len(uniques)
+        in_own = np.bincount(inverse[:n_own], minlength=G) > 0
+        in_other = np.bincount(inverse[n_own:], minlength=G) > 0
+        charge = np.where(in_own, 0.0, own_floor) + np.where(in_other, 0.0, floor)
+        merged = np.bincount(inverse, weights=np.concatenate([self.counts, counts]), minlength=G) + charge
+        error = np.bincount(inverse, weights=np.concatenate([self.errors, errors]), minlength=G) + charge
+
+        if G > self.capacity:
+            keep = np.argpartition(-merged, self.capacity - 1)[:self.capacity]
+            uniques, merged, error = uniques[keep], merged[keep], error[keep]
+        self.keys, self.counts, self.errors = uniques, merged, error
+
+    def update(self, keys, weights=None):
+        """Adds a batch of (key, weight) observations; weights default to 1."""
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(keys):
+            return self
+        uniques, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=weights, minlength=len(uniques)).astype('float64')
+        self.total += counts.sum()
+        # A pre-aggregated batch is exact, so its missing keys carry no charge
+        self._combine(uniques, counts, np.zeros(len(uniques)), 0.0)
+        return self
+
+    def merge(self, other):
+        """Folds another summary (e.g. from another shard or worker) into this one."""
+        self.total += other.total
+        self._combine(other.keys, other.counts, other.errors, other._floor())
+        return self
+
+    def top(self, k):
+        """The k heaviest keys with their estimated count and maximum overestimate."""
+        order = np.argsort(-self.counts, kind='stable')[:k]
+        return pd.DataFrame({'key': self.keys[order], 'count': self.counts[order],
+                             'error': self.errors[order]})
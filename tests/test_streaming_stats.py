@@ -0,0 +1,132 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'analysis')))
+from streaming_stats import CoMoments, QuantileSketch, SpaceSaving
+
+COLUMNS = ['a', 'b', 'c']
+
+def sample_frame(rows=3000, groups=7, seed=0):
+    """Correlated columns with a group label, so grouped and plain correlations both mean something."""
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=rows)
+    return pd.DataFrame({
+        'group': rng.integers(0, groups, size=rows),
+        'a': base + rng.normal(scale=0.5, size=rows),
+        'b': 3 * base + rng.normal(scale=2.0, size=rows) + 100,
+        'c': rng.exponential(size=rows),
+    })
+
+def batches(frame, n):
+    """Splits a frame into n consecutive row batches."""
+    return [frame.iloc[rows] for rows in np.array_split(np.arange(len(frame)), n)]
+
+def assert_group_corr(acc, frame):
+    for label, group in frame.groupby('group'):
+        expected = group[COLUMNS].corr().to_numpy()
+        np.testing.assert_allclose(acc.corr(label).to_numpy(), expected, atol=1e-12)
+
+def test_comoments_matches_pandas_corr_across_batches():
+    frame = sample_frame()
+    acc = CoMoments(COLUMNS)
+    for batch in batches(frame, 5):
+        acc.update(batch)
+    np.testing.assert_allclose(acc.corr().to_numpy(), frame[COLUMNS].corr().to_numpy(), atol=1e-12)
+    assert acc.n[0] == len(frame)
+
+def test_comoments_grouped_update_and_pair_corr():
+    frame = sample_frame()
+    acc = CoMoments(COLUMNS)
+    for batch in batches(frame, 4):
+        acc.update(batch, by=['group'])
+    assert_group_corr(acc, frame)
+
+    expected = frame.groupby('group').apply(lambda g: g['a'].corr(g['b']))
+    pair = acc.pair_corr('a', 'b')
+    np.testing.assert_allclose(pair.loc[expected.index].to_numpy(), expected.to_numpy(), atol=1e-12)
+
+def test_comoments_retraction_equals_rebuild_without_rows():
+    frame = sample_frame()
+    retracted = frame.iloc[::3]
+    acc = CoMoments(COLUMNS).update(frame, by=['group'])
+    acc.remove(retracted, by=['group'])
+    assert_group_corr(acc, frame.drop(retracted.index))
+
+def test_comoments_merge_and_round_trip(tmp_path):
+    frame = sample_frame()
+    left, right = frame.iloc[:1200], frame.iloc[1200:]
+    acc = CoMoments(COLUMNS).update(left, by=['group']).merge(CoMoments(COLUMNS).update(right, by=['group']))
+    assert_group_corr(acc, frame)
+
+    path = os.path.join(tmp_path, "comoments.npz")
+    acc.save(path)
+    assert_group_corr(CoMoments.load(path), frame)
+
+def assert_quantiles(sketch, values, qs=(0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)):
+    # The sketch answers with the rank floor(q * (n - 1)) order statistic, i.e. method='lower'
+    exact = np.quantile(values, qs, method='lower')
+    estimate = sketch.quantiles(qs)
+    np.testing.assert_allclose(estimate, exact, rtol=sketch.relative_accuracy, atol=0)
+
+def test_quantile_sketch_within_relative_accuracy():
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.lognormal(mean=2.0, sigma=1.5, size=20_000), np.zeros(500)])
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for batch in np.array_split(values, 8):
+        sketch.update(batch)
+    assert sketch.count == len(values)
+    assert_quantiles(sketch, values)
+
+def test_quantile_sketch_remove_and_merge(tmp_path):
+    rng = np.random.default_rng(2)
+    values = rng.lognormal(mean=0.0, sigma=2.0, size=10_000)
+    revised = values[:2_500]
+
+    sketch = QuantileSketch().update(values[:6_000]).merge(QuantileSketch().update(values[6_000:]))
+    sketch.remove(revised)
+    assert_quantiles(sketch, values[2_500:])
+
+    path = os.path.join(tmp_path, "sketch.npz")
+    sketch.save(path)
+    assert_quantiles(QuantileSketch.load(path), values[2_500:])
+
+def zipf_stream(size, seed):
+    rng = np.random.default_rng(seed)
+    keys = rng.zipf(1.3, size=size).astype(np.int64)
+    weights = rng.integers(1, 20, size=size).astype('float64')
+    return keys, weights
+
+def assert_space_saving_bounds(summary, keys, weights):
+    exact = pd.Series(weights).groupby(keys).sum()
+    assert np.isclose(summary.total, exact.sum())
+
+    top = summary.top(summary.capacity).set_index('key')
+    truth = exact.reindex(top.index, fill_value=0.0)
+    # Counts never underestimate and overestimate by at most the recorded error
+    assert (top['count'] >= truth - 1e-9).all()
+    assert (top['count'] - top['error'] <= truth + 1e-9).all()
+    assert (top['error'] <= summary.total / summary.capacity + 1e-9).all()
+    # Every key heavier than total / capacity must have been retained
+    heavy = exact[exact > summary.total / summary.capacity].index
+    assert set(heavy) <= set(top.index)
+
+def test_space_saving_error_bounds_across_batches():
+    keys, weights = zipf_stream(50_000, seed=3)
+    summary = SpaceSaving(capacity=200)
+    for k, w in zip(np.array_split(keys, 25), np.array_split(weights, 25)):
+        summary.update(k, w)
+    assert len(summary.keys) <= summary.capacity
+    assert_space_saving_bounds(summary, keys, weights)
+
+def test_space_saving_merge_keeps_bounds():
+    keys, weights = zipf_stream(40_000, seed=4)
+    halves = []
+    for k, w in zip(np.array_split(keys, 2), np.array_split(weights, 2)):
+        part = SpaceSaving(capacity=150)
+        for kb, wb in zip(np.array_split(k, 10), np.array_split(w, 10)):
+            part.update(kb, wb)
+        halves.append(part)
+    merged = halves[0].merge(halves[1])
+    assert_space_saving_bounds(merged, keys, weights)